@@ -1,3 +1,12 @@
+import project.edge_list
+from project.edge_list import *
+
+import project.graph_cache
+from project.graph_cache import *
+
+import project.dot
+from project.dot import *
+
 import project.graph_utils
 from project.graph_utils import *
 
@@ -5,6 +14,12 @@ import project.regex
 from project.regex import *
 
 
+import project.query_cache
+from project.query_cache import *
+
+import project.parallel
+from project.parallel import *
+
 import project.rpq
 from project.rpq import *
 
@@ -23,5 +38,23 @@ from project.cyk import *
 import project.cfpq
 from project.cfpq import *
 
+import project.bitset
+from project.bitset import *
+
+import project.frontier
+from project.frontier import *
+
+import project.compiled_graph
+from project.compiled_graph import *
+
+import project.graph_storage
+from project.graph_storage import *
+
+import project.graph_loader
+from project.graph_loader import *
+
+import project.transitive_closure
+from project.transitive_closure import *
+
 import project.adjacency_matrix
 from project.adjacency_matrix import *
@@ -1,9 +1,59 @@
 from collections import defaultdict
-from typing import Dict, Set, Union
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Set, Union
 
-from pyformlang.finite_automaton import NondeterministicFiniteAutomaton, State
+import numpy as np
+from networkx import MultiDiGraph
+from pyformlang.finite_automaton import NondeterministicFiniteAutomaton, State, Symbol
 from scipy import sparse
-from scipy.sparse import dok_matrix
+
+from project.compiled_graph import CompiledGraph, build_label_matrices
+from project.bitset import pack_bits, unpack_bits
+from project.frontier import DENSE_FRONTIER_DENSITY, Frontier
+from project.transitive_closure import transitive_closure
+
+DENSE_STEP_BYTES = 64 << 20
+
+
+def make_index_to_state(state_indices: Dict) -> np.ndarray:
+    """Builds dense reverse mapping for the given state indices.
+
+    :param state_indices: Dict from state to its index.
+    :return: Object array, where i-th element is the state with index i.
+    """
+    index_to_state = np.empty(len(state_indices), dtype=object)
+    for state, index in state_indices.items():
+        index_to_state[index] = state
+    return index_to_state
+
+
+class ProductStateIndices(Mapping):
+    """Implicit identity mapping of product automaton states 0..size-1 to themselves.
+
+    Serves both as state_indices and index_to_state of an intersection, so that
+    |V|*|Q| product states are never materialized.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, key):
+        if isinstance(key, np.ndarray):
+            if len(key) > 0 and (key.min() < 0 or key.max() >= self.size):
+                raise IndexError("Product state index out of range")
+            return key
+        if key in self:
+            return key
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return isinstance(key, (int, np.integer)) and 0 <= key < self.size
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
 
 
 class AdjacencyMatrix:
@@ -21,6 +71,7 @@ class AdjacencyMatrix:
             self.state_indices = {
                 state: index for index, state in enumerate(nfa.states)
             }
+            self.index_to_state = make_index_to_state(self.state_indices)
             self.matrix = self.__init_matrix__(nfa)
         elif (
             (state_to_index is not None)
@@ -31,13 +82,81 @@ class AdjacencyMatrix:
             self.start_states = start_states
             self.final_states = final_states
             self.state_indices = state_to_index
+            self.index_to_state = make_index_to_state(state_to_index)
             self.matrix = matrix
         else:
             self.start_states = set()
             self.final_states = set()
             self.state_indices = dict()
+            self.index_to_state = np.empty(0, dtype=object)
             self.matrix = dict()
 
+    @classmethod
+    def from_graph(
+        cls,
+        graph: Union[MultiDiGraph, CompiledGraph],
+        start_nodes: Iterable = None,
+        final_nodes: Iterable = None,
+    ) -> "AdjacencyMatrix":
+        """Builds adjacency matrix straight from a graph, without constructing an NFA.
+
+        The result is the same as AdjacencyMatrix(build_nfa_by_graph(graph, start_nodes, final_nodes)).
+        A compiled graph is not re-indexed: its label matrices are shared with the result.
+
+        :param graph: Graph or compiled graph to build the matrix from.
+        :param start_nodes: (optional) nodes to be used as start states. Defaults to all nodes.
+        :param final_nodes: (optional) nodes to be used as final states. Defaults to all nodes.
+        :return: Adjacency matrix of the graph.
+        """
+        if not isinstance(graph, CompiledGraph):
+            graph = CompiledGraph.from_graph(graph)
+        result = cls()
+        result.state_indices = graph.state_indices
+        result.index_to_state = graph.index_to_state
+        matrices = graph.matrices
+
+        extra_nodes = [
+            node
+            for node in set(start_nodes or ()) | set(final_nodes or ())
+            if State(node) not in graph.state_indices
+        ]
+        if extra_nodes:
+            result.state_indices = dict(graph.state_indices)
+            for node in extra_nodes:
+                result.state_indices[State(node)] = len(result.state_indices)
+            result.index_to_state = make_index_to_state(result.state_indices)
+            states_count = len(result.state_indices)
+            matrices = {
+                label: sparse.csr_matrix(
+                    (
+                        matrix.data,
+                        matrix.indices,
+                        np.pad(matrix.indptr, (0, len(extra_nodes)), mode="edge"),
+                    ),
+                    shape=(states_count, states_count),
+                )
+                for label, matrix in matrices.items()
+            }
+
+        states_count = result.get_states_count()
+        result.matrix = defaultdict(
+            lambda: sparse.csr_matrix((states_count, states_count), dtype=bool)
+        )
+        result.matrix.update(
+            (Symbol(label), matrix) for label, matrix in matrices.items()
+        )
+        result.start_states = (
+            set(graph.index_to_state)
+            if start_nodes is None
+            else {State(node) for node in start_nodes}
+        )
+        result.final_states = (
+            set(graph.index_to_state)
+            if final_nodes is None
+            else {State(node) for node in final_nodes}
+        )
+        return result
+
     def get_states_count(self):
         """
         :return: Count of states in the NFA.
@@ -60,9 +179,23 @@ class AdjacencyMatrix:
         return self.state_indices[state]
 
     def state_by_index(self, index):
-        for state, ind in self.state_indices.items():
-            if ind == index:
-                return state
+        return self.index_to_state[index]
+
+    def indices_by_states(self, states: Iterable) -> np.ndarray:
+        """
+        :param states: States of the NFA.
+        :return: Array of indices of the given states.
+        """
+        return np.fromiter(
+            (self.state_indices[state] for state in states), dtype=np.int64
+        )
+
+    def states_by_indices(self, indices) -> List:
+        """
+        :param indices: Array of state indices.
+        :return: States with the given indices, in the same order.
+        """
+        return self.index_to_state[np.asarray(indices, dtype=np.int64)].tolist()
 
     def get_final_states(self):
         """
@@ -70,42 +203,54 @@ class AdjacencyMatrix:
         """
         return self.final_states
 
-    def __init_matrix__(self, n_automaton: NondeterministicFiniteAutomaton):
+    def get_start_indices(self) -> np.ndarray:
+        """
+        :return: Sorted indices of start states in the NFA.
+        """
+        return np.sort(self.indices_by_states(self.start_states))
 
-        result_matrix = defaultdict(
-            lambda: dok_matrix(
-                (len(n_automaton.states), len(n_automaton.states)), dtype=bool
-            )
-        )
-        state_from_to_transition = n_automaton.to_dict()
-        for label in n_automaton.symbols:
-            for state_from, transitions in state_from_to_transition.items():
-                states_to = transitions.get(label, set())
+    def get_final_indices(self) -> np.ndarray:
+        """
+        :return: Sorted indices of final states in the NFA.
+        """
+        return np.sort(self.indices_by_states(self.final_states))
+
+    def __init_matrix__(self, n_automaton: NondeterministicFiniteAutomaton):
+        labels = list(n_automaton.symbols)
+        label_to_id = {label: label_id for label_id, label in enumerate(labels)}
+        label_ids, rows, cols = [], [], []
+        for state_from, transitions in n_automaton.to_dict().items():
+            index_from = self.state_indices[state_from]
+            for label, states_to in transitions.items():
+                label_id = label_to_id.get(label)
+                if label_id is None:
+                    continue
                 if not isinstance(states_to, set):
                     states_to = {states_to}
                 for state_to in states_to:
-                    index_from = self.state_indices[state_from]
-                    index_to = self.state_indices[state_to]
-                    result_matrix[label][index_from, index_to] = True
-        return result_matrix
+                    label_ids.append(label_id)
+                    rows.append(index_from)
+                    cols.append(self.state_indices[state_to])
+
+        return build_label_matrices(
+            labels,
+            np.array(label_ids, dtype=np.int64),
+            np.array(rows, dtype=np.int64),
+            np.array(cols, dtype=np.int64),
+            len(n_automaton.states),
+        )
 
-    def make_transitive_closure(self):
+    def make_transitive_closure(self, strategy: str = "auto"):
         """
+        :param strategy: Closure strategy name, see project.transitive_closure.
         :return: Transitive closure of the adjacency matrix.
         """
+        states_count = self.get_states_count()
         result = sum(
             self.matrix.values(),
-            start=dok_matrix((len(self.state_indices), len(self.state_indices))),
+            start=sparse.csr_matrix((states_count, states_count), dtype=bool),
         )
-        curr_nnz = 0
-        prev_nnz = result.nnz
-
-        while prev_nnz != curr_nnz:
-            result += result.__matmul__(result)
-            prev_nnz = curr_nnz
-            curr_nnz = result.nnz
-
-        return result
+        return transitive_closure(result, strategy)
 
 
 def intersect_adjacency_matrices(
@@ -123,26 +268,26 @@ def intersect_adjacency_matrices(
             first_matrix.matrix[symbol], second_matrix.matrix[symbol], format="csr"
         )
 
-    for state_first, state_first_index in first_matrix.state_indices.items():
-        for state_second, state_second_index in second_matrix.state_indices.items():
-            new_state_index = (
-                state_first_index * second_matrix.get_states_count()
-                + state_second_index
-            )
-            new_state = new_state_index
-            result.state_indices[new_state] = new_state_index
-
-            if (
-                state_first in first_matrix.start_states
-                and state_second in second_matrix.start_states
-            ):
-                result.start_states.add(new_state)
-
-            if (
-                state_first in first_matrix.final_states
-                and state_second in second_matrix.final_states
-            ):
-                result.final_states.add(new_state)
+    second_states_count = second_matrix.get_states_count()
+    states_count = first_matrix.get_states_count() * second_states_count
+    result.state_indices = ProductStateIndices(states_count)
+    result.index_to_state = result.state_indices
+    result.start_states = set(
+        np.add.outer(
+            first_matrix.get_start_indices() * second_states_count,
+            second_matrix.get_start_indices(),
+        )
+        .ravel()
+        .tolist()
+    )
+    result.final_states = set(
+        np.add.outer(
+            first_matrix.get_final_indices() * second_states_count,
+            second_matrix.get_final_indices(),
+        )
+        .ravel()
+        .tolist()
+    )
 
     return result
 
@@ -166,105 +311,241 @@ def am_to_nfa(am: AdjacencyMatrix):
     return automaton
 
 
-def make_front(
-    start_state_indices, first_matrix: AdjacencyMatrix, second_matrix: AdjacencyMatrix
-) -> sparse.csr_matrix:
-    front_row = sparse.dok_matrix((1, first_matrix.get_states_count()), dtype=bool)
-    for i in start_state_indices:
-        front_row[0, i] = True
-    front_row = front_row.tocsr()
-    front = sparse.csr_matrix(
-        (second_matrix.get_states_count(), first_matrix.get_states_count()), dtype=bool
-    )
-    for i in map(
-        lambda state: second_matrix.index_by_state(state), second_matrix.start_states
-    ):
-        front[i, :] = front_row
-    return front
+class LazyKroneckerProduct:
+    """Implicit form of intersect_adjacency_matrices(first_matrix, second_matrix).
 
+    Product state g * |second| + q is never materialized: products with the operator are
+    computed label by label as (G ⊗ Q)·x = vec(G · X · Qᵀ), where X is x reshaped to |first| x |second|.
+    Sets of row vectors are kept in block layout: a (blocks * |second|) x |first| matrix,
+    where row r * |second| + q, column g holds the value of product state (g, q) of the r-th vector.
+    """
 
-def get_reachable(
-    sub_front_idx,
-    first_matrix: AdjacencyMatrix,
-    second_matrix: AdjacencyMatrix,
-    visited,
-) -> Set[State]:
-    sub_front_offset = sub_front_idx * second_matrix.get_states_count()
-    reachable = sparse.csr_matrix((1, first_matrix.get_states_count()), dtype=bool)
-    for i in map(
-        lambda state: second_matrix.index_by_state(state), second_matrix.final_states
-    ):
-        reachable += visited[sub_front_offset + i, :]
-    return set(
-        first_matrix.state_by_index(i)
-        for i in reachable.nonzero()[1]
-        if i
-        in map(
-            lambda state: first_matrix.index_by_state(state), first_matrix.final_states
+    def __init__(self, first_matrix: AdjacencyMatrix, second_matrix: AdjacencyMatrix):
+        self.first_matrix = first_matrix
+        self.second_matrix = second_matrix
+        self.labels = first_matrix.matrix.keys() & second_matrix.matrix.keys()
+        self.first_states_count = first_matrix.get_states_count()
+        self.second_states_count = second_matrix.get_states_count()
+        self.shape = (
+            self.first_states_count * self.second_states_count,
+            self.first_states_count * self.second_states_count,
+        )
+        self._block_diagonals: Dict = dict()
+
+    def get_start_indices(self) -> np.ndarray:
+        """
+        :return: Sorted indices of start product states.
+        """
+        return np.sort(
+            np.add.outer(
+                self.first_matrix.get_start_indices() * self.second_states_count,
+                self.second_matrix.get_start_indices(),
+            ).ravel()
+        )
+
+    def get_final_indices(self) -> np.ndarray:
+        """
+        :return: Sorted indices of final product states.
+        """
+        return np.sort(
+            np.add.outer(
+                self.first_matrix.get_final_indices() * self.second_states_count,
+                self.second_matrix.get_final_indices(),
+            ).ravel()
+        )
+
+    def matvec(self, vector: np.ndarray) -> np.ndarray:
+        """Multiplies the product by a column vector.
+
+        :param vector: Boolean vector of length |first| * |second|.
+        :return: Boolean vector (G ⊗ Q)·x summed over common labels.
+        """
+        x = np.asarray(vector, dtype=np.float64).reshape(
+            self.first_states_count, self.second_states_count
+        )
+        result = np.zeros_like(x)
+        for label in self.labels:
+            first_part = self.first_matrix.matrix[label] @ x
+            result += (self.second_matrix.matrix[label] @ first_part.T).T
+        return (result > 0).ravel()
+
+    def rmatvec(self, vector: np.ndarray) -> np.ndarray:
+        """Multiplies a row vector by the product.
+
+        :param vector: Boolean vector of length |first| * |second|.
+        :return: Boolean vector x·(G ⊗ Q) summed over common labels.
+        """
+        x = np.asarray(vector, dtype=np.float64).reshape(
+            self.first_states_count, self.second_states_count
+        )
+        result = np.zeros_like(x)
+        for label in self.labels:
+            first_part = self.first_matrix.matrix[label].T @ x
+            result += (self.second_matrix.matrix[label].T @ first_part.T).T
+        return (result > 0).ravel()
+
+    def _block_diagonal(self, label, blocks: int) -> sparse.csr_matrix:
+        key = (label, blocks)
+        if key not in self._block_diagonals:
+            self._block_diagonals[key] = sparse.kron(
+                sparse.eye(blocks, dtype=bool),
+                self.second_matrix.matrix[label].T,
+                format="csr",
+            ).astype(bool)
+        return self._block_diagonals[key]
+
+    def step(self, front: sparse.csr_matrix) -> sparse.csr_matrix:
+        """Moves every vector of the front along one edge of the product.
+
+        :param front: Vectors in block layout.
+        :return: Vectors in block layout, each multiplied by the product from the right.
+        """
+        blocks = front.shape[0] // self.second_states_count
+        result = sparse.csr_matrix(front.shape, dtype=bool)
+        for label in self.labels:
+            moved = front @ self.first_matrix.matrix[label]
+            result = result + self._block_diagonal(label, blocks) @ moved
+        return result
+
+    def step_frontier(self, front: Frontier) -> Frontier:
+        """Same as step, but for fronts that may be stored as packed bitsets.
+
+        Dense fronts are unpacked into boolean arrays chunk by chunk, whole vectors at a time,
+        and as many vectors as fit into DENSE_STEP_BYTES (at least one) are held unpacked at once.
+        Boolean sparse products sum with OR, so no wider dtype is needed.
+
+        :param front: Vectors in block layout.
+        :return: Vectors in block layout, each multiplied by the product from the right.
+        """
+        if not front.is_dense():
+            return Frontier.from_sparse(self.step(front.matrix), front.threshold)
+
+        # Unpacked chunk, its product with the first matrix and the accumulated result.
+        block_bytes = 3 * self.second_states_count * max(1, self.first_states_count)
+        chunk_blocks = max(1, DENSE_STEP_BYTES // block_bytes)
+        chunk_rows = chunk_blocks * self.second_states_count
+        result = np.empty_like(front.words)
+        for chunk_start in range(0, front.shape[0], chunk_rows):
+            chunk = slice(chunk_start, chunk_start + chunk_rows)
+            dense = unpack_bits(front.words[chunk], front.shape[1])
+            blocks = dense.shape[0] // self.second_states_count
+            accumulated = np.zeros_like(dense)
+            for label in self.labels:
+                moved = dense @ self.first_matrix.matrix[label]
+                accumulated |= self._block_diagonal(label, blocks) @ moved
+            result[chunk] = pack_bits(accumulated)
+        return Frontier.from_words(result, front.shape[1], front.threshold)
+
+    def make_front(
+        self,
+        blocks: int,
+        block_ids: np.ndarray,
+        first_indices: np.ndarray,
+        second_indices: np.ndarray,
+    ) -> sparse.csr_matrix:
+        """Builds block layout front from product states given as coordinate arrays.
+
+        :param blocks: Number of vectors in the front.
+        :param block_ids: Vector of every product state.
+        :param first_indices: First component of every product state.
+        :param second_indices: Second component of every product state.
+        :return: Front in block layout.
+        """
+        return sparse.csr_matrix(
+            (
+                np.ones(len(block_ids), dtype=bool),
+                (block_ids * self.second_states_count + second_indices, first_indices),
+            ),
+            shape=(blocks * self.second_states_count, self.first_states_count),
+        )
+
+    def closure_rows(self, sources: np.ndarray) -> sparse.csr_matrix:
+        """Calculates rows of the transitive closure of the product for the given states.
+
+        :param sources: Product state indices.
+        :return: Boolean len(sources) x |first| * |second| matrix, whose i-th row
+                 holds states reachable from sources[i] by a non-empty path.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        first_indices, second_indices = np.divmod(sources, self.second_states_count)
+        front = self.step(
+            self.make_front(
+                len(sources), np.arange(len(sources)), first_indices, second_indices
+            )
+        )
+        visited = front
+        while front.nnz != 0:
+            front = self.step(front) > visited
+            visited = visited + front
+
+        visited = visited.tocoo()
+        blocks, second_indices = np.divmod(visited.row, self.second_states_count)
+        return sparse.csr_matrix(
+            (
+                np.ones(visited.nnz, dtype=bool),
+                (blocks, visited.col * self.second_states_count + second_indices),
+            ),
+            shape=(len(sources), self.shape[1]),
         )
-    )
 
 
 def sync_bfs(
     first_matrix: AdjacencyMatrix,
     second_matrix: AdjacencyMatrix,
     all_reachable: bool = False,
+    frontier_density: float = DENSE_FRONTIER_DENSITY,
+    start_states: Iterable[State] = None,
 ) -> Union[Set[State], Dict[State, Set[State]],]:
     """Performs synchronized BFS on two NFA's.
     :param all_reachable: Specifies whether for each start node will be returned a set of reachable nodes as Dict,
                           or all reachable nodes as Set from the given start nodes set (True for Set, False for Dict)
+    :param frontier_density: Density, at which front and visited sets are switched to packed bitsets.
+    :param start_states: (optional) start states of the first NFA to run BFS from. Defaults to all of them.
     :return: Reachable nodes depending on all_reachable flag.
     """
-    if not first_matrix.start_states:
+    start_states = list(
+        first_matrix.start_states if start_states is None else start_states
+    )
+    if not start_states:
         return dict() if all_reachable else set()
 
-    common_symbols = first_matrix.matrix.keys().__and__(second_matrix.matrix.keys())
-    front = (
-        sparse.vstack(
-            [
-                make_front({i}, first_matrix, second_matrix)
-                for i in map(
-                    lambda state: first_matrix.index_by_state(state),
-                    first_matrix.start_states,
-                )
-            ]
-        )
+    product = LazyKroneckerProduct(first_matrix, second_matrix)
+    first_starts = first_matrix.indices_by_states(start_states)
+    second_starts = second_matrix.get_start_indices()
+    blocks = len(first_starts) if all_reachable else 1
+    front = product.make_front(
+        blocks,
+        np.repeat(np.arange(len(first_starts)), len(second_starts))
         if all_reachable
-        else make_front(
-            map(
-                lambda state: first_matrix.index_by_state(state),
-                first_matrix.start_states,
-            ),
-            first_matrix,
-            second_matrix,
-        )
+        else np.zeros(len(first_starts) * len(second_starts), dtype=np.int64),
+        np.repeat(first_starts, len(second_starts)),
+        np.tile(second_starts, len(first_starts)),
     )
+    front = Frontier.from_sparse(front, frontier_density)
     visited = front
-    while True:
-        next_front = sparse.csr_matrix(front.shape, dtype=bool)
-        for label in common_symbols:
-            next_front_part = front.__matmul__(first_matrix.matrix[label])
-            for index in range(len(first_matrix.start_states) if all_reachable else 1):
-                offset = index * second_matrix.get_states_count()
-                for (i, j) in zip(*second_matrix.matrix[label].nonzero()):
-                    next_front[offset + j, :] += next_front_part[offset + i, :]
-        front = next_front > visited
-        visited += front
-        if front.count_nonzero() == 0:
-            break
-
-    return (
-        {
-            first_matrix.state_by_index(start_state_idx): get_reachable(
-                sub_front_idx, first_matrix, second_matrix, visited
-            )
-            for sub_front_idx, start_state_idx in enumerate(
-                map(
-                    lambda state: first_matrix.index_by_state(state),
-                    first_matrix.start_states,
-                )
+    while front.nnz != 0:
+        front = product.step_frontier(front).difference(visited)
+        visited = visited.union(front)
+
+    final_rows = np.add.outer(
+        np.arange(blocks) * product.second_states_count,
+        second_matrix.get_final_indices(),
+    ).ravel()
+    visited = visited.select_rows(final_rows).to_sparse().tocoo()
+    block_ids = final_rows[visited.row] // product.second_states_count
+    is_reachable = np.isin(visited.col, first_matrix.get_final_indices())
+    block_ids, first_indices = block_ids[is_reachable], visited.col[is_reachable]
+    if not all_reachable:
+        return set(first_matrix.states_by_indices(np.unique(first_indices)))
+
+    order = np.lexsort((first_indices, block_ids))
+    block_ids, first_indices = block_ids[order], first_indices[order]
+    bounds = np.searchsorted(block_ids, np.arange(blocks + 1))
+    return {
+        start_state: set(
+            first_matrix.states_by_indices(
+                first_indices[bounds[block_id] : bounds[block_id + 1]]
             )
-        }
-        if all_reachable
-        else get_reachable(0, first_matrix, second_matrix, visited)
-    )
+        )
+        for block_id, start_state in enumerate(start_states)
+    }
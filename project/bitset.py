@@ -0,0 +1,29 @@
+import numpy as np
+
+WORD_BITS = 64
+WORD_DTYPE = np.dtype("<u8")
+POPCOUNT_TABLE = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int64)
+
+
+def pack_bits(matrix: np.ndarray) -> np.ndarray:
+    """Packs rows of the boolean matrix into little-endian uint64 words.
+
+    :param matrix: Dense boolean rows x cols matrix.
+    :return: rows x ceil(cols / 64) array of words, bit j % 64 of word j // 64 holds column j.
+    """
+    rows, cols = matrix.shape
+    words_count = -(-cols // WORD_BITS)
+    packed = np.zeros((rows, words_count * 8), dtype=np.uint8)
+    packed[:, : -(-cols // 8)] = np.packbits(matrix, axis=1, bitorder="little")
+    return packed.view(WORD_DTYPE)
+
+
+def unpack_bits(words: np.ndarray, cols: int) -> np.ndarray:
+    """
+    :param words: Array of words produced by pack_bits.
+    :param cols: Number of columns of the original matrix.
+    :return: Dense boolean matrix.
+    """
+    return np.unpackbits(
+        words.view(np.uint8), axis=1, count=cols, bitorder="little"
+    ).view(bool)
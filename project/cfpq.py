@@ -1,238 +1,811 @@
 from collections import deque, defaultdict
-from typing import Union, Set
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Set, Tuple, Union
 
+import numpy as np
 from networkx import MultiDiGraph
 from pyformlang.cfg import CFG, Variable, Terminal
-from pyformlang.finite_automaton import EpsilonNFA
-from scipy.sparse import dok_matrix, eye
+from scipy import sparse
+from scipy.sparse import csr_matrix, eye
 
 from project import (
-    load_graph,
     get_cfg_from_file,
     cfg_to_weak_cnf,
     convert_cfg_to_ecfg,
     convert_ecfg_to_rsm,
     build_adjacency_matrix_from_rsm,
-    AdjacencyMatrix,
-    intersect_adjacency_matrices,
 )
+from project.compiled_graph import CompiledGraph
+from project.graph_loader import load_compiled_graph
+from project.transitive_closure import transitive_closure
 
 
-def run_hellings_algo(cfg: CFG, graph: MultiDiGraph) -> Set:
-    """Runs Hellings algorithm on the given Context Free Grammar and graph.
+class MatrixAlgoStats(NamedTuple):
+    """Work done by run_matrix_algo: number of rounds and number of new entries found in each."""
 
-    :param cfg: Context Free Grammar.
-    :param graph: Graph.
-    :return: Set of Triples [vertex, variable, vertex]. It means that two variables have path between them that
-    was received from the specified CFG variable.
+    iterations: int
+    delta_nnz: List[int]
+
+
+class CFPQMatrices(NamedTuple):
+    """Compact CFPQ result: boolean CSR matrix of every variable over node indices.
+
+    Cell (i, j) of the matrix of a variable is set if there is a path from nodes[i] to nodes[j]
+    derivable from this variable.
     """
 
-    node_count = graph.number_of_nodes()
-    if node_count == 0:
-        return set()
+    nodes: Sequence
+    matrices: Dict[Variable, csr_matrix]
+
+
+class CFPQPairs(NamedTuple):
+    """Compact reachability pairs: k-th pair is (nodes[sources[k]], nodes[targets[k]])."""
+
+    nodes: Sequence
+    sources: np.ndarray
+    targets: np.ndarray
+
+
+RESULT_FORMATS = ("set", "matrix", "arrays")
+ALGO_RESULT_FORMATS = ("set", "matrix")
+
+
+def check_result_format(
+    result_format: str, formats: Sequence[str] = ALGO_RESULT_FORMATS
+):
+    """
+    :param result_format: Requested result format.
+    :param formats: Supported result formats.
+    :raises ValueError: If the format is not supported.
+    """
+    if result_format not in formats:
+        raise ValueError(f"Unknown result format: {result_format}")
+
 
+def split_weak_cnf(cfg: CFG) -> Tuple[Set, Dict, Dict]:
+    """Converts grammar to weak CNF and indexes its productions by body.
+
+    :param cfg: Context Free Grammar.
+    :return: Variables with epsilon productions, dict from terminal to variables producing it,
+             and dict from body (B, C) to variables producing it.
+    """
     weak_cnf = cfg_to_weak_cnf(cfg)
-    terminal_to_variable = defaultdict(set)
-    pair_variables_to_variable = defaultdict(set)
+    terminal_to_variables = defaultdict(set)
+    pair_to_variables = defaultdict(set)
     epsilon_variables = set()
-
     for p in weak_cnf.productions:
         head, body = p.head, p.body
         body_len = len(body)
         if body_len == 0:
             epsilon_variables.add(head)
         elif body_len == 1:
-            terminal_to_variable[head].add(body[0])
+            terminal_to_variables[body[0]].add(head)
         elif body_len == 2:
-            pair_variables_to_variable[head].add((body[0], body[1]))
+            pair_to_variables[(body[0], body[1])].add(head)
+    return epsilon_variables, terminal_to_variables, pair_to_variables
+
+
+def node_mask(graph: CompiledGraph, nodes: Iterable = None) -> np.ndarray:
+    """
+    :param graph: Compiled graph.
+    :param nodes: (optional) graph nodes. Nodes missing in the graph are ignored.
+    :return: Boolean mask of the given nodes over node indices, all True if nodes are not given.
+    """
+    if nodes is None:
+        return np.ones(graph.number_of_nodes(), dtype=bool)
+    node_to_index = graph.node_to_index
+    mask = np.zeros(graph.number_of_nodes(), dtype=bool)
+    mask[[node_to_index[node] for node in nodes if node in node_to_index]] = True
+    return mask
+
+
+def mask_rows(matrix: csr_matrix, mask: np.ndarray) -> csr_matrix:
+    """
+    :param matrix: CSR matrix.
+    :param mask: Boolean mask over its rows.
+    :return: The matrix with rows outside the mask cleared.
+    """
+    row_nnz = np.diff(matrix.indptr)
+    is_kept = np.repeat(mask, row_nnz)
+    indptr = np.zeros_like(matrix.indptr)
+    np.cumsum(row_nnz * mask, out=indptr[1:])
+    return csr_matrix(
+        (matrix.data[is_kept], matrix.indices[is_kept], indptr), shape=matrix.shape
+    )
+
+
+def empty_result(result_format: str = "set") -> Union[Set, CFPQMatrices]:
+    """
+    :param result_format: "set" or "matrix".
+    :return: Result of a query on an empty graph in the given format.
+    """
+    check_result_format(result_format)
+    return (
+        CFPQMatrices(nodes=[], matrices=dict()) if result_format == "matrix" else set()
+    )
+
+
+def collect_result(
+    graph: CompiledGraph,
+    var_to_matrix: Dict,
+    start_nodes: Set = None,
+    final_nodes: Set = None,
+    start_symbol: Variable = None,
+    result_format: str = "set",
+) -> Union[Set, CFPQMatrices]:
+    """Keeps only requested entries of per-variable matrices over node indices.
+
+    Algorithms may compute extra rows that paths from start nodes depend on, they are dropped here.
+
+    :param graph: Compiled graph the matrices are indexed by.
+    :param var_to_matrix: Dict from variable to its boolean matrix.
+    :param start_nodes: (optional) nodes triples may start at. Defaults to all nodes.
+    :param final_nodes: (optional) nodes triples may end at. Defaults to all nodes.
+    :param start_symbol: (optional) the only variable to collect triples of. Defaults to all variables.
+    :param result_format: "set" for a set of triples, "matrix" for CFPQMatrices.
+    :return: Set of Triples [vertex, variable, vertex], or CFPQMatrices.
+    """
+    check_result_format(result_format)
+    rows_mask = sparse.diags(node_mask(graph, start_nodes), dtype=bool, format="csr")
+    cols_mask = sparse.diags(node_mask(graph, final_nodes), dtype=bool, format="csr")
+    matrices = {
+        var: csr_matrix(rows_mask @ matrix @ cols_mask, dtype=bool)
+        for var, matrix in var_to_matrix.items()
+        if start_symbol is None or var == start_symbol
+    }
+    if result_format == "matrix":
+        return CFPQMatrices(nodes=graph.node_ids, matrices=matrices)
+
+    nodes = graph.node_list
+    result = set()
+    for var, matrix in matrices.items():
+        rows, cols = matrix.nonzero()
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            result.add((nodes[i], var, nodes[j]))
+    return result
+
+
+def triples_to_matrices(nodes: Sequence, triples: Iterable) -> CFPQMatrices:
+    """
+    :param nodes: Node table.
+    :param triples: Triples [vertex, variable, vertex] over the given nodes.
+    :return: The same triples as CFPQMatrices.
+    """
+    node_to_index = {node: index for index, node in enumerate(nodes)}
+    var_to_cells = defaultdict(lambda: ([], []))
+    for i, var, j in triples:
+        rows, cols = var_to_cells[var]
+        rows.append(node_to_index[i])
+        cols.append(node_to_index[j])
+    return CFPQMatrices(
+        nodes=nodes,
+        matrices={
+            var: csr_matrix(
+                (np.ones(len(rows), dtype=bool), (rows, cols)),
+                shape=(len(nodes), len(nodes)),
+            )
+            for var, (rows, cols) in var_to_cells.items()
+        },
+    )
+
+
+def run_hellings_algo(
+    cfg: CFG,
+    graph: Union[MultiDiGraph, CompiledGraph],
+    start_nodes: Set = None,
+    final_nodes: Set = None,
+    start_symbol: Variable = None,
+    result_format: str = "set",
+) -> Union[Set, CFPQMatrices]:
+    """Runs Hellings algorithm on the given Context Free Grammar and graph.
+
+    Found triples are indexed by their start and end vertices and productions by their bodies,
+    so every triple taken from the worklist is joined only with adjacent triples of matching
+    variables.
+
+    With start nodes, triples of a variable are kept only from vertices its paths are needed
+    from, propagated as in run_multiple_source_algo, so the rest of the graph is not explored.
+
+    :param cfg: Context Free Grammar.
+    :param graph: Graph.
+    :param start_nodes: (optional) nodes returned triples may start at. Defaults to all nodes.
+    :param final_nodes: (optional) nodes returned triples may end at. Only filters the result. Defaults to all nodes.
+    :param start_symbol: (optional) the only variable to return triples of. Defaults to all variables.
+    :param result_format: "set" for a set of triples, "matrix" for CFPQMatrices.
+    :return: Set of Triples [vertex, variable, vertex]. It means that two variables have path between them that
+    was received from the specified CFG variable.
+    """
+
+    check_result_format(result_format)
+    node_count = graph.number_of_nodes()
+    if node_count == 0:
+        return empty_result(result_format)
+
+    epsilon_variables, terminal_to_variables, pair_to_variables = split_weak_cnf(cfg)
+
+    # (B, C) -> heads, split by the side a popped variable takes in the body.
+    by_left_variable = defaultdict(list)
+    by_right_variable = defaultdict(list)
+    for (left, right), heads in pair_to_variables.items():
+        by_left_variable[left].append((right, heads))
+        by_right_variable[right].append((left, heads))
 
     result = set()
-    for node in graph.nodes:
-        for var in epsilon_variables:
-            result.add((node, var, node))
-    for i, j, label in graph.edges(data="label"):
-        for n, terms in terminal_to_variable.items():
-            if Terminal(label) in terms:
-                result.add((i, n, j))
-
-    dq = deque(result.copy())
-
-    while len(dq) > 0:
-        i, var1, j = dq.popleft()
-        sub_res = set()
-        for u, var2, v in result:
-            if v == i:
-                for node_count, var_to_var in pair_variables_to_variable.items():
-                    new = (u, node_count, j)
-                    if (var2, var1) in var_to_var and new not in result:
-                        dq.append(new)
-                        sub_res.add(new)
-            if j == u:
-                for node_count, var_to_var in pair_variables_to_variable.items():
-                    new = (i, node_count, v)
-                    if (var1, var2) in var_to_var and new not in result:
-                        dq.append(new)
-                        sub_res.add(new)
-        result = result.union(sub_res)
+    incoming = defaultdict(lambda: defaultdict(set))
+    outgoing = defaultdict(lambda: defaultdict(set))
+    dq = deque()
+
+    # Start vertices triples of every variable are needed from, None for all vertices.
+    var_to_sources = None if start_nodes is None else defaultdict(set)
+    sources_dq = deque()
+
+    def add(triple):
+        if triple not in result:
+            u, var, v = triple
+            if var_to_sources is not None and u not in var_to_sources[var]:
+                return
+            result.add(triple)
+            incoming[v][var].add(u)
+            outgoing[u][var].add(v)
+            dq.append(triple)
+            if var_to_sources is not None:
+                for right, heads in by_left_variable.get(var, ()):
+                    if any(u in var_to_sources[head] for head in heads):
+                        add_source(v, right)
+
+    def add_source(node, var):
+        if node not in var_to_sources[var]:
+            var_to_sources[var].add(node)
+            sources_dq.append((node, var))
+
+    if var_to_sources is None:
+        for node in graph.nodes:
+            for var in epsilon_variables:
+                add((node, var, node))
+        for i, j, label in graph.edges(data="label"):
+            for var in terminal_to_variables.get(Terminal(label), ()):
+                add((i, var, j))
+    else:
+        var_to_bodies = defaultdict(list)
+        for body, heads in pair_to_variables.items():
+            for head in heads:
+                var_to_bodies[head].append(body)
+        terminal_edges = defaultdict(lambda: defaultdict(list))
+        for i, j, label in graph.edges(data="label"):
+            for var in terminal_to_variables.get(Terminal(label), ()):
+                terminal_edges[i][var].append(j)
+        nodes = set(graph.nodes)
+        seeds = (
+            set(epsilon_variables)
+            .union(*terminal_to_variables.values())
+            .union(*pair_to_variables.values())
+            if start_symbol is None
+            else {start_symbol}
+        )
+        for node in start_nodes:
+            if node in nodes:
+                for var in seeds:
+                    add_source(node, var)
 
+    while len(dq) > 0 or len(sources_dq) > 0:
+        if len(sources_dq) > 0:
+            # Triples from a new source vertex, including joins skipped before it became one.
+            node, var = sources_dq.popleft()
+            if var in epsilon_variables:
+                add((node, var, node))
+            for j in terminal_edges[node].get(var, ()):
+                add((node, var, j))
+            for left, right in var_to_bodies[var]:
+                add_source(node, left)
+                for w in list(outgoing[node].get(left, ())):
+                    add_source(w, right)
+                    for v in list(outgoing[w].get(right, ())):
+                        add((node, var, v))
+            continue
+
+        i, var, j = dq.popleft()
+        for left, heads in by_right_variable.get(var, ()):
+            for u in list(incoming[i].get(left, ())):
+                for head in heads:
+                    add((u, head, j))
+        for right, heads in by_left_variable.get(var, ()):
+            for v in list(outgoing[j].get(right, ())):
+                for head in heads:
+                    add((i, head, v))
+
+    if start_nodes is not None:
+        start_nodes = set(start_nodes)
+    if final_nodes is not None:
+        final_nodes = set(final_nodes)
+    result = {
+        (i, var, j)
+        for i, var, j in result
+        if (start_symbol is None or var == start_symbol)
+        and (start_nodes is None or i in start_nodes)
+        and (final_nodes is None or j in final_nodes)
+    }
+    if result_format == "matrix":
+        return triples_to_matrices(list(graph.nodes), result)
     return result
 
 
-def run_matrix_algo(cfg: CFG, graph: MultiDiGraph) -> Set:
+def run_matrix_algo(
+    cfg: CFG,
+    graph: Union[MultiDiGraph, CompiledGraph],
+    start_nodes: Set = None,
+    final_nodes: Set = None,
+    start_symbol: Variable = None,
+    result_format: str = "set",
+    return_stats: bool = False,
+) -> Union[Set, CFPQMatrices, Tuple[Union[Set, CFPQMatrices], MatrixAlgoStats]]:
     """Runs Matrix algorithm on the given Context Free Grammar and graph.
 
+    Semi-naive: every round multiplies only the entries found in the previous round against
+    the full CSR matrices, until no new entries appear.
+
+    With start nodes, every variable is computed only for the rows its paths are needed from,
+    propagated as in run_multiple_source_algo: rows added to a variable are computed once in
+    full, and later rounds multiply only its deltas restricted to its rows.
+
     :param cfg: Context Free Grammar.
     :param graph: Graph.
+    :param start_nodes: (optional) nodes returned triples may start at. Defaults to all nodes.
+    :param final_nodes: (optional) nodes returned triples may end at, masks result columns. Defaults to all nodes.
+    :param start_symbol: (optional) the only variable to return triples of. Defaults to all variables.
+    :param result_format: "set" for a set of triples, "matrix" for CFPQMatrices.
+    :param return_stats: Whether to return MatrixAlgoStats along with the result.
     :return: Set of Triples [vertex, variable, vertex]. It means that two variables have path between them that
-    was received from the specified CFG variable.
+    was received from the specified CFG variable. With return_stats, a pair of it and MatrixAlgoStats.
     """
+    check_result_format(result_format)
     node_count = graph.number_of_nodes()
     if node_count == 0:
-        return set()
+        result = empty_result(result_format)
+        return (result, MatrixAlgoStats(0, [])) if return_stats else result
 
-    nodes = list(graph.nodes)
-    node_to_index = defaultdict(int)
-    for i, node in enumerate(nodes):
-        node_to_index[i] = node
+    if not isinstance(graph, CompiledGraph):
+        graph = CompiledGraph.from_graph(graph)
+    epsilon_variables, terminal_to_variables, pair_to_variables = split_weak_cnf(cfg)
+    variables = (
+        set(epsilon_variables)
+        .union(*terminal_to_variables.values())
+        .union(*pair_to_variables.values())
+        .union(*pair_to_variables.keys())
+    )
+    if start_symbol is not None:
+        variables.add(start_symbol)
 
-    weak_cnf = cfg_to_weak_cnf(cfg)
-    terminal_to_variable = defaultdict(set)
-    pair_variables_to_variable = defaultdict(set)
-    epsilon_variables = set()
-    for p in weak_cnf.productions:
-        head, body = p.head, p.body
-        body_len = len(body)
-        if body_len == 0:
-            epsilon_variables.add(head)
-        elif body_len == 1:
-            terminal_to_variable[head].add(body[0])
-        elif body_len == 2:
-            pair_variables_to_variable[head].add((body[0], body[1]))
+    empty = csr_matrix((node_count, node_count), dtype=bool)
+    var_to_initial = {var: empty for var in variables}
+    identity = eye(node_count, dtype=bool, format="csr")
+    for var in epsilon_variables:
+        var_to_initial[var] = var_to_initial[var] + identity
+    for terminal, heads in terminal_to_variables.items():
+        label_matrix = graph.matrices.get(terminal.value)
+        if label_matrix is None:
+            continue
+        for var in heads:
+            var_to_initial[var] = var_to_initial[var] + label_matrix
+    var_to_bodies = defaultdict(list)
+    for body, heads in pair_to_variables.items():
+        for var in heads:
+            var_to_bodies[var].append(body)
 
-    var_to_matrix = defaultdict(dok_matrix)
-    for var in weak_cnf.variables:
-        var_to_matrix[var] = dok_matrix((node_count, node_count), dtype=bool)
+    # Rows each variable is computed for, as in run_multiple_source_algo.
+    if start_nodes is None:
+        all_rows = np.ones(node_count, dtype=bool)
+        var_to_sources = {var: all_rows for var in variables}
+    else:
+        start_mask = node_mask(graph, start_nodes)
+        seeds = variables if start_symbol is None else {start_symbol}
+        var_to_sources = {
+            var: start_mask if var in seeds else np.zeros(node_count, dtype=bool)
+            for var in variables
+        }
+    var_to_known_sources = {var: np.zeros(node_count, dtype=bool) for var in variables}
 
-    for i in range(node_count):
-        for node_count in epsilon_variables:
-            var_to_matrix[node_count][i, i] = True
+    def restrict(var, matrix):
+        return matrix if start_nodes is None else mask_rows(matrix, var_to_sources[var])
 
-    for i_node, j_node, label in graph.edges(data="label"):
-        i, j = node_to_index[i_node], node_to_index[j_node]
-        for node_count, terms in terminal_to_variable.items():
-            if Terminal(label) in terms:
-                var_to_matrix[node_count][i, j] = True
+    def mark_row_ends(reached, matrix, rows):
+        reached[matrix.indices[np.repeat(rows, np.diff(matrix.indptr))]] = True
 
-    while True:
-        changed = False
-        for node_count, var_to_var in pair_variables_to_variable.items():
-            old_nnz = var_to_matrix[node_count].nnz
-            var_to_matrix[node_count] += sum(
-                var_to_matrix[n1] @ var_to_matrix[n2] for n1, n2 in var_to_var
+    var_to_matrix = {var: empty for var in variables}
+    var_to_delta = dict(var_to_matrix)
+    var_to_propagated = dict(var_to_known_sources)
+    delta_nnz = []
+    has_new_sources = True
+    while has_new_sources or delta_nnz[-1] > 0:
+        new_delta = dict()
+        for var in variables if has_new_sources else ():
+            new_sources = var_to_sources[var] > var_to_known_sources[var]
+            if not new_sources.any():
+                continue
+            var_to_known_sources[var] = var_to_sources[var]
+            candidates = mask_rows(var_to_initial[var], new_sources)
+            for left, right in var_to_bodies[var]:
+                candidates = (
+                    candidates
+                    + mask_rows(var_to_matrix[left], new_sources) @ var_to_matrix[right]
+                )
+            new_delta[var] = candidates
+
+        for (left, right), heads in pair_to_variables.items():
+            if var_to_delta[left].nnz == 0 and var_to_delta[right].nnz == 0:
+                continue
+            product = (
+                var_to_delta[left] @ var_to_matrix[right]
+                + var_to_matrix[left] @ var_to_delta[right]
             )
-            changed |= old_nnz != var_to_matrix[node_count].nnz
-        if changed is False:
-            break
+            for var in heads:
+                new_delta[var] = new_delta.get(var, empty) + restrict(var, product)
 
-    result = set()
-    for var, matrix in var_to_matrix.items():
-        for i, j in zip(*matrix.nonzero()):
-            result.add((nodes[i], var, nodes[j]))
+        var_to_delta = {var: empty for var in variables}
+        for var, candidates in new_delta.items():
+            var_to_delta[var] = candidates > var_to_matrix[var]
+            var_to_matrix[var] = var_to_matrix[var] + var_to_delta[var]
+        delta_nnz.append(sum(matrix.nnz for matrix in var_to_delta.values()))
+
+        has_new_sources = False
+        if start_nodes is None:
+            continue
+        # Ends of new left paths from scanned sources, and of all left paths from new ones.
+        sources_snapshot = dict(var_to_sources)
+        for (left, right), heads in pair_to_variables.items():
+            for var in heads:
+                sources = sources_snapshot[var]
+                reached = np.zeros(node_count, dtype=bool)
+                if var_to_delta[left].nnz > 0:
+                    mark_row_ends(reached, var_to_delta[left], var_to_propagated[var])
+                new_sources = sources > var_to_propagated[var]
+                if new_sources.any():
+                    mark_row_ends(reached, var_to_matrix[left], new_sources)
+                for body_var, body_sources in ((left, sources), (right, reached)):
+                    if np.any(body_sources > var_to_sources[body_var]):
+                        var_to_sources[body_var] = (
+                            var_to_sources[body_var] | body_sources
+                        )
+                        has_new_sources = True
+        var_to_propagated = sources_snapshot
+
+    result = collect_result(
+        graph, var_to_matrix, start_nodes, final_nodes, start_symbol, result_format
+    )
+    if return_stats:
+        return result, MatrixAlgoStats(
+            iterations=len(delta_nnz) - 1, delta_nnz=delta_nnz
+        )
     return result
 
 
-def run_tensor_algo(cfg: CFG, graph: MultiDiGraph) -> Set:
+def run_tensor_algo(
+    cfg: CFG,
+    graph: Union[MultiDiGraph, CompiledGraph],
+    start_nodes: Set = None,
+    final_nodes: Set = None,
+    start_symbol: Variable = None,
+    result_format: str = "set",
+    closure_strategy: str = "auto",
+) -> Union[Set, CFPQMatrices]:
     """Runs Tensor based algorithm on the given Context Free Grammar and graph.
 
+    Incremental: the closure T of the RSM and graph product is kept between rounds. When a round
+    adds nonterminal edges dG, only the product blocks R_N x dG_N are built, and paths through
+    them are added as T' = T + (I + T)(dM (I + T))^+. New nonterminal edges are read from the
+    new closure entries in bulk.
+
+    Products and the closure of dM are bounded by the new paths, but every round still scans
+    T once (T @ X visits every stored entry of T, and T' is a new CSR matrix), so a round costs
+    O(nnz(T)) plus the work on new paths, not the new paths alone.
+
+    With start nodes, the product has edges only from active states: start states of the
+    start_symbol box (of every box without it) at start nodes, start states of boxes at vertices
+    they are called from, and states reachable from those. Other rows of T are never computed.
+
     :param cfg: Context Free Grammar.
     :param graph: Graph.
+    :param start_nodes: (optional) nodes returned triples may start at. Defaults to all nodes.
+    :param final_nodes: (optional) nodes returned triples may end at. Only filters the result. Defaults to all nodes.
+    :param start_symbol: (optional) the only variable to return triples of. Defaults to all labels.
+    :param result_format: "set" for a set of triples, "matrix" for CFPQMatrices.
+    :param closure_strategy: Transitive closure strategy, see project.transitive_closure.
     :return: Set of Triples [vertex, variable, vertex]. It means that two variables have path between them that
     was received from the specified CFG variable.
     """
-    cfg_adj_mtx = build_adjacency_matrix_from_rsm(
+    check_result_format(result_format)
+    node_count = graph.number_of_nodes()
+    if node_count == 0:
+        return empty_result(result_format)
+    if not isinstance(graph, CompiledGraph):
+        graph = CompiledGraph.from_graph(graph)
+
+    rsm_adj_mtx = build_adjacency_matrix_from_rsm(
         convert_ecfg_to_rsm(convert_cfg_to_ecfg(cfg))
     )
-    cfg_index_to_state = dict()
-    for s, i in cfg_adj_mtx.state_indices.items():
-        cfg_index_to_state[i] = s
-    graph_adj_mtx = AdjacencyMatrix(nfa=EpsilonNFA.from_networkx(graph))
-    graph_adj_mtx_states_size = len(graph_adj_mtx.state_indices)
-    graph_index_to_state = {i: s for s, i in graph_adj_mtx.state_indices.items()}
-    self_loop_mtx = eye(len(graph_adj_mtx.state_indices), dtype=bool).todok()
+    rsm_matrices = {
+        label: csr_matrix(matrix, dtype=bool)
+        for label, matrix in rsm_adj_mtx.matrix.items()
+    }
+    rsm_states_count = rsm_adj_mtx.get_states_count()
+    nonterm_names = sorted(
+        {state.value[0].value for state in rsm_adj_mtx.index_to_state}, key=str
+    )
+    nonterm_ids = {name: nonterm_id for nonterm_id, name in enumerate(nonterm_names)}
+    state_nonterm_ids = np.array(
+        [nonterm_ids[state.value[0].value] for state in rsm_adj_mtx.index_to_state],
+        dtype=np.int64,
+    )
+    is_start = np.zeros(rsm_states_count, dtype=bool)
+    is_start[rsm_adj_mtx.get_start_indices()] = True
+    is_final = np.zeros(rsm_states_count, dtype=bool)
+    is_final[rsm_adj_mtx.get_final_indices()] = True
+
+    product_size = rsm_states_count * node_count
+    empty = csr_matrix((node_count, node_count), dtype=bool)
+    closure = csr_matrix((product_size, product_size), dtype=bool)
+    graph_matrices = dict()
+    delta = dict(graph.matrices)
     for nonterm in cfg.get_nullable_symbols():
-        graph_adj_mtx.matrix[nonterm.value] += self_loop_mtx
-    last_tc_size = 0
+        delta[nonterm.value] = delta.get(nonterm.value, empty) + eye(
+            node_count, dtype=bool, format="csr"
+        )
+
+    # Product states (RSM state, vertex) paths are needed from, all of them without start
+    # nodes. Otherwise they are start states of the seeded boxes at the start nodes and at
+    # vertices other boxes are called from, and the states reachable from those.
+    if start_nodes is None:
+        active = np.ones(product_size, dtype=bool)
+    else:
+        start_mask = node_mask(graph, start_nodes)
+        nonterm_sources = np.zeros((len(nonterm_names), node_count), dtype=bool)
+        for nonterm_id, name in enumerate(nonterm_names):
+            if start_symbol is None or name == start_symbol.value:
+                nonterm_sources[nonterm_id] = start_mask
+        calls = [
+            (nonterm_ids[label], csr_matrix(matrix).getnnz(axis=1) > 0)
+            for label, matrix in rsm_matrices.items()
+            if label in nonterm_ids
+        ]
+        active = np.zeros(product_size, dtype=bool)
+    covered = np.zeros(product_size, dtype=bool)
+
+    def product_rows(label_matrices: Dict, rows: np.ndarray = None):
+        """RSM and graph product of the given matrices, only rows of the given states."""
+        if rows is not None:
+            node_rows = rows.reshape(rsm_states_count, node_count).any(axis=0)
+        result = csr_matrix((product_size, product_size), dtype=bool)
+        for label, matrix in label_matrices.items():
+            if label in rsm_matrices:
+                if rows is not None:
+                    matrix = mask_rows(csr_matrix(matrix, dtype=bool), node_rows)
+                result = result + sparse.kron(rsm_matrices[label], matrix, format="csr")
+        return result if rows is None else mask_rows(result, rows)
+
     while True:
-        intersection = intersect_adjacency_matrices(cfg_adj_mtx, graph_adj_mtx)
-        tc_indices = list(zip(*intersection.make_transitive_closure().nonzero()))
-        if len(tc_indices) == last_tc_size:
+        for label, matrix in delta.items():
+            graph_matrices[label] = graph_matrices.get(label, empty) + matrix
+        if start_nodes is not None:
+            # Activate everything reachable over known edges, so one closure covers it.
+            expanded = covered.copy()
+            while True:
+                states = active.reshape(rsm_states_count, node_count)
+                for nonterm_id, is_caller in calls:
+                    nonterm_sources[nonterm_id] |= states[is_caller].any(axis=0)
+                states[is_start] |= nonterm_sources[state_nonterm_ids[is_start]]
+                frontier = active > expanded
+                if not frontier.any():
+                    break
+                expanded |= frontier
+                active[product_rows(graph_matrices, frontier).indices] = True
+        new_rows = active > covered
+        if not delta and not new_rows.any():
             break
-        last_tc_size = len(tc_indices)
-        for i, j in tc_indices:
-            cfg_i, cfg_j = (
-                i // graph_adj_mtx_states_size,
-                j // graph_adj_mtx_states_size,
-            )
-            graph_i = i % graph_adj_mtx_states_size
-            graph_j = j % graph_adj_mtx_states_size
-            state_from, state_to = cfg_index_to_state[cfg_i], cfg_index_to_state[cfg_j]
-            nonterm, _ = state_from.value
-            if (
-                state_from in cfg_adj_mtx.start_states
-                and state_to in cfg_adj_mtx.final_states
-            ):
-                graph_adj_mtx.matrix[nonterm][graph_i, graph_j] = True
-    result = set()
-    for nonterm, matrix in graph_adj_mtx.matrix.items():
-        for graph_i, graph_j in zip(*matrix.nonzero()):
-            result.add(
-                (graph_index_to_state[graph_i], nonterm, graph_index_to_state[graph_j])
+
+        if start_nodes is None:
+            delta_product = product_rows(delta)
+        else:
+            # New states bring all their edges, the others only the new ones.
+            delta_product = product_rows(delta, covered)
+            if new_rows.any():
+                delta_product = delta_product + product_rows(graph_matrices, new_rows)
+        covered = active.copy()
+        delta = dict()
+        if delta_product.nnz == 0:
+            continue
+
+        # (I + T)(dM (I + T))^+ without materializing I + T.
+        delta_paths = transitive_closure(
+            csr_matrix(delta_product + delta_product @ closure, dtype=bool),
+            closure_strategy,
+        )
+        new_paths = delta_paths + closure @ delta_paths
+        new_closure = new_paths > closure
+        closure = closure + new_closure
+        # Only rows of active states have edges, so this keeps them closed under reachability.
+        active[new_closure.indices] = True
+
+        rows, cols = new_closure.nonzero()
+        rsm_from, graph_from = np.divmod(rows, node_count)
+        rsm_to, graph_to = np.divmod(cols, node_count)
+        is_nonterm_path = is_start[rsm_from] & is_final[rsm_to]
+        path_nonterm_ids = state_nonterm_ids[rsm_from[is_nonterm_path]]
+        graph_from, graph_to = graph_from[is_nonterm_path], graph_to[is_nonterm_path]
+
+        delta = dict()
+        for nonterm_id in np.unique(path_nonterm_ids).tolist():
+            is_current = path_nonterm_ids == nonterm_id
+            name = nonterm_names[nonterm_id]
+            candidates = csr_matrix(
+                (
+                    np.ones(is_current.sum(), dtype=bool),
+                    (graph_from[is_current], graph_to[is_current]),
+                ),
+                shape=(node_count, node_count),
             )
-    return result
+            new_edges = candidates > graph_matrices.get(name, empty)
+            if new_edges.nnz > 0:
+                delta[name] = new_edges
+
+    return collect_result(
+        graph,
+        {
+            Variable(label) if label in nonterm_ids else label: matrix
+            for label, matrix in graph_matrices.items()
+        },
+        start_nodes,
+        final_nodes,
+        start_symbol,
+        result_format,
+    )
+
+
+def run_multiple_source_algo(
+    cfg: CFG,
+    graph: Union[MultiDiGraph, CompiledGraph],
+    start_nodes: Set = None,
+    final_nodes: Set = None,
+    start_symbol: Variable = None,
+    result_format: str = "set",
+) -> Union[Set, CFPQMatrices]:
+    """Runs multiple-source Matrix algorithm on the given Context Free Grammar and graph.
+
+    Every variable has a set of source vertices its paths are needed from: start nodes for the
+    start symbol (the start_symbol argument, or the one of the grammar if it is not given),
+    and for A -> B C sources of A for B and ends of B-paths from them for C. Matrices are
+    computed only for rows of sources, so the work depends on the part of the graph reachable
+    from start nodes rather than on the whole graph.
+
+    :param cfg: Context Free Grammar.
+    :param graph: Graph.
+    :param start_nodes: Set of graph start nodes. Defaults to all nodes being start nodes.
+    :param final_nodes: (optional) nodes returned triples may end at. Defaults to all nodes.
+    :param start_symbol: (optional) the only variable to return triples of. Defaults to all variables.
+    :param result_format: "set" for a set of triples, "matrix" for CFPQMatrices.
+    :return: Set of Triples [vertex, variable, vertex]. Complete for the start symbol and start nodes,
+    other variables have triples only from vertices their paths were needed from.
+    """
+    check_result_format(result_format)
+    node_count = graph.number_of_nodes()
+    if node_count == 0:
+        return empty_result(result_format)
+    if not isinstance(graph, CompiledGraph):
+        graph = CompiledGraph.from_graph(graph)
+    epsilon_variables, terminal_to_variables, pair_to_variables = split_weak_cnf(cfg)
+    seed_symbol = cfg.start_symbol if start_symbol is None else start_symbol
+    variables = (
+        {seed_symbol}
+        .union(epsilon_variables)
+        .union(*terminal_to_variables.values())
+        .union(*pair_to_variables.values())
+        .union(*pair_to_variables.keys())
+    )
+
+    empty = csr_matrix((node_count, node_count), dtype=bool)
+    var_to_terminals = {var: empty for var in variables}
+    for terminal, heads in terminal_to_variables.items():
+        label_matrix = graph.matrices.get(terminal.value)
+        if label_matrix is None:
+            continue
+        for var in heads:
+            var_to_terminals[var] = var_to_terminals[var] + label_matrix
+
+    var_to_sources = {var: np.zeros(node_count, dtype=bool) for var in variables}
+    var_to_sources[seed_symbol] = node_mask(graph, start_nodes)
+    var_to_matrix = {var: empty for var in variables}
+
+    def select_rows(mask: np.ndarray):
+        return sparse.diags(mask, dtype=bool, format="csr")
+
+    changed = True
+    while changed:
+        changed = False
+        for (left, right), heads in pair_to_variables.items():
+            for var in heads:
+                sources = var_to_sources[var]
+                left_paths = select_rows(sources) @ var_to_matrix[left]
+                reached = np.zeros(node_count, dtype=bool)
+                reached[left_paths.indices] = True
+                for body_var, body_sources in ((left, sources), (right, reached)):
+                    if np.any(body_sources > var_to_sources[body_var]):
+                        var_to_sources[body_var] = (
+                            var_to_sources[body_var] | body_sources
+                        )
+                        changed = True
+
+        for var in variables:
+            rows = select_rows(var_to_sources[var])
+            matrix = rows @ var_to_terminals[var]
+            if var in epsilon_variables:
+                matrix = matrix + rows
+            for (left, right), heads in pair_to_variables.items():
+                if var in heads:
+                    matrix = matrix + rows @ var_to_matrix[left] @ var_to_matrix[right]
+            matrix = csr_matrix(matrix, dtype=bool)
+            if matrix.nnz != var_to_matrix[var].nnz:
+                var_to_matrix[var] = matrix
+                changed = True
+
+    return collect_result(
+        graph, var_to_matrix, start_nodes, final_nodes, start_symbol, result_format
+    )
 
 
 algo_map = {
     "hellings": run_hellings_algo,
     "matrix": run_matrix_algo,
     "tensor": run_tensor_algo,
+    "multiple_source": run_multiple_source_algo,
 }
 
 
 def run_cfpq(
     algo: str,
-    graph: Union[str, MultiDiGraph],
+    graph: Union[str, MultiDiGraph, CompiledGraph],
     cfg: Union[str, CFG],
     start_nodes: Set = None,
     final_nodes: Set = None,
     start_symbol: Variable = Variable("S"),
-) -> Set:
-    """Executes query on graph with Hellings algorithm.
+    result_format: str = "set",
+) -> Union[Set, CFPQMatrices, CFPQPairs]:
+    """Executes context free path query on graph with the given algorithm.
 
-    :param algo: String name of the algorithm to use for CFPQ. Currently supports "hellings" and "matrix".
-    :param graph: Given graph, as name from cfpq-data dataset, or graph itself as MultiDiGraph.
+    :param algo: String name of the algorithm to use for CFPQ, one of algo_map keys.
+    :param graph: Given graph, as name from cfpq-data dataset, or graph itself as MultiDiGraph or CompiledGraph.
     :param cfg: File path containing Context Free Grammar, or Context Free Grammar instead.
-    :param start_nodes: Set of graph start nodes. Defaults to all nodes being start nodes.
+    :param start_nodes: Set of graph start nodes. Every algorithm computes only paths needed from them. Defaults to all nodes being start nodes.
     :param final_nodes: Set of graph final nodes. Defaults to all nodes being final nodes.
     :param start_symbol: Start symbol of the given grammar. Defaults to "S".
+    :param result_format: "set" for a set of node pairs, "matrix" for CFPQMatrices with the matrix of
+    the start symbol, or "arrays" for CFPQPairs with int32 node indices.
     :return: Pairs of vertices that have path between them with given constraints from graph.
+    The graph is not modified.
     """
 
+    check_result_format(result_format, RESULT_FORMATS)
     if isinstance(graph, str):
-        graph = load_graph(graph)
+        graph = load_compiled_graph(graph)
     if isinstance(cfg, str):
         cfg = get_cfg_from_file(cfg)
-    cfg._start_symbol = start_symbol
-    if start_nodes is None:
-        start_nodes = graph.nodes
-    if final_nodes is None:
-        final_nodes = graph.nodes
-    for node, data in graph.nodes(data=True):
-        if node in start_nodes:
-            data["is_start"] = True
-        if node in final_nodes:
-            data["is_final"] = True
-    result_set = set()
-    for (i, k, j) in algo_map[algo](cfg, graph):
-        if start_symbol == k and i in start_nodes and j in final_nodes:
-            result_set.add((i, j))
-    return result_set
+    cfg = CFG(cfg.variables, cfg.terminals, start_symbol, cfg.productions)
+    result = algo_map[algo](
+        cfg,
+        graph,
+        start_nodes=start_nodes,
+        final_nodes=final_nodes,
+        start_symbol=start_symbol,
+        result_format="set" if result_format == "set" else "matrix",
+    )
+    if result_format == "set":
+        return {(i, j) for i, _, j in result}
+
+    node_count = len(result.nodes)
+    matrix = result.matrices.get(start_symbol)
+    if matrix is None:
+        matrix = csr_matrix((node_count, node_count), dtype=bool)
+    if result_format == "matrix":
+        return CFPQMatrices(nodes=result.nodes, matrices={start_symbol: matrix})
+    sources, targets = matrix.nonzero()
+    return CFPQPairs(
+        nodes=result.nodes,
+        sources=sources.astype(np.int32),
+        targets=targets.astype(np.int32),
+    )
@@ -0,0 +1,191 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+from networkx import MultiDiGraph
+from pyformlang.finite_automaton import State
+from scipy import sparse
+
+
+def build_label_matrices(
+    labels: List,
+    label_ids: np.ndarray,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    states_count: int,
+) -> Dict:
+    """Builds boolean CSR matrices for every label from flat edge index arrays.
+
+    :param labels: Labels, where label_ids[k] is the index of the k-th edge label in this list.
+    :param label_ids: Label index of every edge.
+    :param rows: Source state index of every edge.
+    :param cols: Destination state index of every edge.
+    :param states_count: Number of states, i.e. the size of each matrix.
+    :return: Dict (defaulting to an empty matrix) from label to its CSR matrix.
+    """
+    result_matrix = defaultdict(
+        lambda: sparse.csr_matrix((states_count, states_count), dtype=bool)
+    )
+    order = np.argsort(label_ids, kind="stable")
+    bounds = np.searchsorted(label_ids[order], np.arange(len(labels) + 1))
+    for label_id, label in enumerate(labels):
+        edges = order[bounds[label_id] : bounds[label_id + 1]]
+        result_matrix[label] = sparse.csr_matrix(
+            (np.ones(len(edges), dtype=bool), (rows[edges], cols[edges])),
+            shape=(states_count, states_count),
+        )
+    return result_matrix
+
+
+class CompiledGraph:
+    """Labeled graph indexed once for querying.
+
+    Holds the node table, the label table and a boolean CSR matrix per label, so that queries
+    do not re-index the graph. Can be passed to rpq_tensor, rpq_bfs and run_cfpq in place of
+    a MultiDiGraph. Matrices are shared by every query and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        nodes: Sequence,
+        labels: Sequence,
+        matrices: Dict,
+        label_edges_count: np.ndarray,
+    ):
+        """
+        :param nodes: Node table, i-th node has index i. Kept as is, so it may be a memory-mapped array.
+        :param labels: Label table.
+        :param matrices: Dict from every label to its boolean CSR matrix.
+        :param label_edges_count: Number of edges (parallel ones included) of every label.
+        """
+        self.node_ids = nodes
+        self.labels = list(labels)
+        self.label_to_id = {label: label_id for label_id, label in enumerate(labels)}
+        self.matrices = matrices
+        self.label_edges_count = label_edges_count
+        self.edges_count = int(np.sum(label_edges_count))
+        self._node_list = None
+        self._node_to_index = None
+        self._state_indices = None
+        self._index_to_state = None
+
+    @classmethod
+    def from_edges(
+        cls,
+        nodes: Sequence,
+        labels: Sequence,
+        label_ids: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+    ) -> "CompiledGraph":
+        """
+        :param nodes: Node table, i-th node has index i.
+        :param labels: Label table, i-th label has index i.
+        :param label_ids: Label index of every edge.
+        :param rows: Source node index of every edge.
+        :param cols: Destination node index of every edge.
+        :return: Compiled graph with the given edges.
+        """
+        labels = list(labels)
+        return cls(
+            nodes,
+            labels,
+            dict(build_label_matrices(labels, label_ids, rows, cols, len(nodes))),
+            np.bincount(label_ids, minlength=len(labels)),
+        )
+
+    @classmethod
+    def from_graph(cls, graph: MultiDiGraph) -> "CompiledGraph":
+        """
+        :param graph: Graph to compile.
+        :return: Compiled graph.
+        """
+        node_to_index = {node: index for index, node in enumerate(graph.nodes)}
+        label_to_id = dict()
+        label_ids, rows, cols = [], [], []
+        for node_from, node_to, label in graph.edges(data="label"):
+            label_ids.append(label_to_id.setdefault(label, len(label_to_id)))
+            rows.append(node_to_index[node_from])
+            cols.append(node_to_index[node_to])
+
+        compiled = cls.from_edges(
+            list(node_to_index.keys()),
+            label_to_id.keys(),
+            np.array(label_ids, dtype=np.int64),
+            np.array(rows, dtype=np.int64),
+            np.array(cols, dtype=np.int64),
+        )
+        compiled._node_to_index = node_to_index
+        return compiled
+
+    @property
+    def node_list(self) -> List:
+        if self._node_list is None:
+            self._node_list = (
+                self.node_ids.tolist()
+                if isinstance(self.node_ids, np.ndarray)
+                else list(self.node_ids)
+            )
+        return self._node_list
+
+    @property
+    def node_to_index(self) -> Dict:
+        if self._node_to_index is None:
+            self._node_to_index = {
+                node: index for index, node in enumerate(self.node_list)
+            }
+        return self._node_to_index
+
+    @property
+    def state_indices(self) -> Dict:
+        """
+        :return: Dict from State of every node to the node index.
+        """
+        if self._state_indices is None:
+            self._state_indices = {
+                State(node): index for index, node in enumerate(self.node_list)
+            }
+        return self._state_indices
+
+    @property
+    def index_to_state(self) -> np.ndarray:
+        """
+        :return: Object array, where i-th element is State of the i-th node.
+        """
+        if self._index_to_state is None:
+            self._index_to_state = np.empty(len(self.node_list), dtype=object)
+            for index, node in enumerate(self.node_list):
+                self._index_to_state[index] = State(node)
+        return self._index_to_state
+
+    @property
+    def nodes(self) -> List:
+        return self.node_list
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return self.edges_count
+
+    def indices_by_nodes(self, nodes: Iterable) -> np.ndarray:
+        """
+        :param nodes: Graph nodes.
+        :return: Array of indices of the given nodes.
+        """
+        node_to_index = self.node_to_index
+        return np.fromiter((node_to_index[node] for node in nodes), dtype=np.int64)
+
+    def edges(self, data: str = None) -> Iterable:
+        """Iterates over edges like MultiDiGraph.edges, parallel edges with equal labels are merged.
+
+        :param data: Pass "label" to get (node from, node to, label) triples.
+        :return: Iterable of edges.
+        """
+        for label, matrix in self.matrices.items():
+            rows, cols = matrix.nonzero()
+            for node_from, node_to in zip(rows.tolist(), cols.tolist()):
+                if data == "label":
+                    yield self.node_list[node_from], self.node_list[node_to], label
+                else:
+                    yield self.node_list[node_from], self.node_list[node_to]
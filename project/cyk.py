@@ -1,43 +1,524 @@
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
 from pyformlang.cfg import CFG
 
+from project.bitset import WORD_BITS, pack_bits, unpack_bits
 
-def cyk(word: str, cfg: CFG) -> bool:
-    """Checks if a word belongs to a given grammar using CYK algorithm.
+CYK_BATCH_SIZE = 4096
+CYK_MEMORY_BYTES = 256 << 20
+VALIANT_LEAF_SIZE = 512
+
+_worker_grammar = dict()
+
+
+class CompiledGrammar:
+    """Grammar prepared for CYK once, to check any number of words against it.
+
+    The grammar is converted to CNF, its variables get bit indices, so a set of variables is
+    a bitmask of ceil(|V| / 64) uint64 words, and binary rules are grouped by body (B, C)
+    into a bitmask of their heads.
+    """
+
+    def __init__(self, cfg: CFG):
+        self.generates_epsilon = cfg.generate_epsilon()
+        cnf = cfg.to_normal_form()
+        variables = sorted(cnf.variables, key=str)
+        self.variable_to_bit = {var: bit for bit, var in enumerate(variables)}
+        self.variables_count = len(variables)
+        self.words_count = max(1, -(-self.variables_count // WORD_BITS))
+        self.start_bit = self.variable_to_bit.get(cnf.start_symbol)
+
+        self.terminal_masks: Dict[str, np.ndarray] = defaultdict(self.empty_mask)
+        rule_heads = defaultdict(self.empty_mask)
+        for production in cnf.productions:
+            head_bit = self.variable_to_bit[production.head]
+            if len(production.body) == 1:
+                self._set_bit(self.terminal_masks[production.body[0].value], head_bit)
+            elif len(production.body) == 2:
+                body = tuple(self.variable_to_bit[var] for var in production.body)
+                self._set_bit(rule_heads[body], head_bit)
+        self.terminal_masks = dict(self.terminal_masks)
+        self.terminal_ids = {
+            terminal: terminal_id + 1
+            for terminal_id, terminal in enumerate(self.terminal_masks)
+        }
+        self.terminal_mask_table = np.array(
+            [self.empty_mask()] + list(self.terminal_masks.values()), dtype=np.uint64
+        )
+        self.rule_bodies = np.array(list(rule_heads.keys()), dtype=np.int64).reshape(
+            -1, 2
+        )
+        self.rule_heads = np.array(list(rule_heads.values()), dtype=np.uint64).reshape(
+            -1, self.words_count
+        )
+
+    def empty_mask(self) -> np.ndarray:
+        return np.zeros(self.words_count, dtype=np.uint64)
+
+    @staticmethod
+    def _set_bit(mask: np.ndarray, bit: int):
+        mask[bit // WORD_BITS] |= np.uint64(1) << np.uint64(bit % WORD_BITS)
+
+    def has_bit(self, masks: np.ndarray, bit: int) -> np.ndarray:
+        """
+        :param masks: Array of bitmasks, the last axis holds words of a mask.
+        :param bit: Bit index of a variable.
+        :return: Boolean array telling whether each mask contains the variable.
+        """
+        word = masks[..., bit // WORD_BITS]
+        return ((word >> np.uint64(bit % WORD_BITS)) & np.uint64(1)).astype(bool)
+
+    def words_masks(self, words: Sequence[Sequence[str]]) -> np.ndarray:
+        """
+        :param words: Words of the same length, as sequences of terminals.
+        :return: length x len(words) x words_count array, bitmasks of variables producing every terminal.
+        """
+        terminal_ids = np.array(
+            [[self.terminal_ids.get(symbol, 0) for symbol in word] for word in words],
+            dtype=np.int64,
+        ).reshape(len(words), -1)
+        return self.terminal_mask_table[terminal_ids.T]
+
+    def combine(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Applies binary rules to all pairs of cells at once.
+
+        :param left: Bitmasks of left parts, shape (..., splits, words_count).
+        :param right: Bitmasks of right parts of the same shape.
+        :return: Bitmasks of heads derivable by any split, shape (..., words_count).
+        """
+        result = np.zeros(left.shape[:-2] + (self.words_count,), dtype=np.uint64)
+        left_bits, right_bits = dict(), dict()
+        for (left_bit, right_bit), heads in zip(self.rule_bodies, self.rule_heads):
+            if left_bit not in left_bits:
+                left_bits[left_bit] = self.has_bit(left, left_bit)
+            if right_bit not in right_bits:
+                right_bits[right_bit] = self.has_bit(right, right_bit)
+            derived = np.any(left_bits[left_bit] & right_bits[right_bit], axis=-1)
+            result[derived] |= heads
+        return result
+
+
+def cyk_word_bytes(word_length: int, grammar: CompiledGrammar) -> int:
+    """
+    :param word_length: Length of words.
+    :param grammar: Compiled grammar.
+    :return: Estimate of memory cyk_same_length needs per word: a bit per variable for every
+             span in the table and in the cells gathered for the widest span length.
+    """
+    table_cells = word_length * (word_length + 1) // 2
+    gathered_cells = 2 * (word_length // 2 + 1) ** 2
+    return -(-(table_cells + gathered_cells) * grammar.variables_count // 8)
+
+
+def _span_offsets(word_length: int) -> np.ndarray:
+    # Spans of the same length are stored together: span (length, start) is the row
+    # offsets[length - 1] + start, so only the word_length * (word_length + 1) / 2 spans exist.
+    return np.concatenate(
+        [[0], np.cumsum(np.arange(word_length, 0, -1, dtype=np.int64))]
+    )
+
+
+def _cyk_word(word: str, grammar: CompiledGrammar) -> bool:
+    # A single word would use one bit of every word-indexed bitset, so here a span holds
+    # the bitmask of its variables instead.
+    word_length = len(word)
+    offsets = _span_offsets(word_length)
+    table = np.zeros((offsets[-1], grammar.words_count), dtype=np.uint64)
+    table[:word_length] = grammar.words_masks([word])[:, 0]
+    for length in range(2, word_length + 1):
+        starts = np.arange(word_length - length + 1)[:, None]
+        splits = np.arange(1, length)[None, :]
+        table[offsets[length - 1] : offsets[length]] = grammar.combine(
+            table[offsets[splits - 1] + starts],
+            table[offsets[length - splits - 1] + starts + splits],
+        )
+    return bool(grammar.has_bit(table[offsets[word_length - 1]], grammar.start_bit))
+
+
+def _cyk_words_chunk(words: Sequence[str], grammar: CompiledGrammar) -> np.ndarray:
+    word_length, variables_count = len(words[0]), grammar.variables_count
+    # Bits run across words here: table[span, variable] is a bitset of the words whose span is
+    # derived from the variable, so a rule is applied to 64 words per AND.
+    masks = grammar.words_masks(words)
+    terminal_bits = np.stack(
+        [grammar.has_bit(masks, bit) for bit in range(variables_count)], axis=1
+    )
+    offsets = _span_offsets(word_length)
+    table = np.zeros(
+        (offsets[-1], variables_count, -(-len(words) // WORD_BITS)), dtype=np.uint64
+    )
+    table[:word_length] = pack_bits(
+        terminal_bits.reshape(word_length * variables_count, len(words))
+    ).reshape(word_length, variables_count, -1)
+
+    left_vars, left_positions = np.unique(
+        grammar.rule_bodies[:, 0], return_inverse=True
+    )
+    right_vars, right_positions = np.unique(
+        grammar.rule_bodies[:, 1], return_inverse=True
+    )
+    rule_heads = [
+        [bit for bit in range(variables_count) if grammar.has_bit(heads, bit)]
+        for heads in grammar.rule_heads
+    ]
+    cells = table.reshape(-1, table.shape[2])
+    for length in range(2, word_length + 1):
+        starts = np.arange(word_length - length + 1)[:, None, None]
+        splits = np.arange(1, length)[None, :, None]
+        left = cells[(offsets[splits - 1] + starts) * variables_count + left_vars]
+        right = cells[
+            (offsets[length - splits - 1] + starts + splits) * variables_count
+            + right_vars
+        ]
+        spans = table[offsets[length - 1] : offsets[length]]
+        for left_position, right_position, heads in zip(
+            left_positions, right_positions, rule_heads
+        ):
+            derived = np.bitwise_or.reduce(
+                left[:, :, left_position] & right[:, :, right_position], axis=1
+            )
+            for head in heads:
+                spans[:, head] |= derived
+
+    start_words = table[offsets[word_length - 1], grammar.start_bit]
+    return unpack_bits(start_words[None, :], len(words))[0]
+
+
+def cyk_same_length(
+    words: Sequence[str],
+    grammar: CompiledGrammar,
+    memory_bytes: int = CYK_MEMORY_BYTES,
+) -> np.ndarray:
+    """Runs CYK for words of the same length at once.
+
+    The DP table holds a bitset of words per span and variable, so every span length is filled
+    for all start positions and split points at once, and a rule is applied to 64 words per AND.
+    Words are processed in chunks that fit into memory_bytes by cyk_word_bytes.
+
+    :param words: Non-empty sequence of words of the same length.
+    :param grammar: Compiled grammar.
+    :param memory_bytes: Memory budget of one chunk of words. At least one word is processed at once.
+    :return: Boolean array telling whether each word belongs to the grammar.
+    """
+    word_length = len(words[0])
+    if word_length == 0:
+        return np.full(len(words), grammar.generates_epsilon)
+    if grammar.start_bit is None:
+        return np.zeros(len(words), dtype=bool)
+
+    if len(words) == 1:
+        return np.array([_cyk_word(words[0], grammar)])
+    chunk_size = max(1, memory_bytes // cyk_word_bytes(word_length, grammar))
+    return np.concatenate(
+        [
+            _cyk_words_chunk(words[chunk_start : chunk_start + chunk_size], grammar)
+            for chunk_start in range(0, len(words), chunk_size)
+        ]
+    )
+
+
+class _ValiantTable:
+    """CYK table of one word for Valiant's algorithm.
+
+    Cell (i, j), i < j, is the span word[i:j]. table[A] is the bit-packed boolean matrix of
+    spans derived from the variable A, and products[r] accumulates spans derived from the body
+    of the r-th binary rule by splits multiplied in so far. Both are indexed by positions
+    0..len(word), padded to a multiple of 64, so blocks cut at multiples of 64 are whole words.
+    """
+
+    def __init__(self, word: str, grammar: CompiledGrammar, leaf_size: int):
+        self.grammar = grammar
+        self.leaf_size = leaf_size
+        self.size = -(-(len(word) + 1) // WORD_BITS) * WORD_BITS
+        words_count = self.size // WORD_BITS
+        self.rule_bodies = grammar.rule_bodies
+        self.rule_heads = np.stack(
+            [
+                grammar.has_bit(grammar.rule_heads, bit)
+                for bit in range(grammar.variables_count)
+            ]
+        )
+        self.table = np.zeros(
+            (grammar.variables_count, self.size, words_count), dtype=np.uint64
+        )
+        self.products = np.zeros(
+            (len(self.rule_bodies), self.size, words_count), dtype=np.uint64
+        )
+
+        masks = grammar.words_masks([word])[:, 0]
+        for bit in range(grammar.variables_count):
+            (starts,) = np.nonzero(grammar.has_bit(masks, bit))
+            self.table[bit, starts, (starts + 1) // WORD_BITS] |= np.uint64(1) << (
+                (starts + 1) % WORD_BITS
+            ).astype(np.uint64)
+
+    @staticmethod
+    def _unpack(packed: np.ndarray, rows: slice, cols: slice) -> np.ndarray:
+        words = np.ascontiguousarray(
+            packed[:, rows, cols.start // WORD_BITS : cols.stop // WORD_BITS]
+        )
+        count, rows_count, words_count = words.shape
+        return unpack_bits(
+            words.reshape(count * rows_count, words_count), words_count * WORD_BITS
+        ).reshape(count, rows_count, -1)
+
+    @staticmethod
+    def _add(packed: np.ndarray, rows: slice, cols: slice, block: np.ndarray):
+        count, rows_count, cols_count = block.shape
+        packed[:, rows, cols.start // WORD_BITS : cols.stop // WORD_BITS] |= pack_bits(
+            block.reshape(count * rows_count, cols_count)
+        ).reshape(count, rows_count, -1)
+
+    @staticmethod
+    def _middle(start: int, end: int) -> int:
+        return start + -(-(end - start) // (2 * WORD_BITS)) * WORD_BITS
+
+    def multiply(self, rows: slice, middle: slice, cols: slice):
+        """Adds splits at positions of middle to products of the rows x cols block.
+
+        :param rows: Start positions of spans, all before middle.
+        :param middle: Split positions, all before cols.
+        :param cols: End positions of spans.
+        """
+        left = self._unpack(self.table, rows, middle)
+        right = self._unpack(self.table, middle, cols)
+        product = np.zeros(
+            (len(self.rule_bodies), left.shape[1], right.shape[2]), dtype=bool
+        )
+        left_blocks, right_blocks = dict(), dict()
+        for index, (left_bit, right_bit) in enumerate(self.rule_bodies):
+            if not (left[left_bit].any() and right[right_bit].any()):
+                continue
+            if left_bit not in left_blocks:
+                left_blocks[left_bit] = left[left_bit].astype(np.float32)
+            if right_bit not in right_blocks:
+                right_blocks[right_bit] = right[right_bit].astype(np.float32)
+            product[index] = left_blocks[left_bit] @ right_blocks[right_bit] > 0
+        self._add(self.products, rows, cols, product)
+
+    def _solve_leaf(self, rows: slice, cols: slice = None):
+        """Fills a small block cell by cell in order of span length, as plain CYK does.
+
+        Cells are numbered by local positions: rows, then cols, with the gap between them
+        already accounted for in products. Local rows and columns are kept as bitsets, so a
+        wave of cells of the same span length is one AND over words per rule.
+
+        :param rows: Start positions of spans.
+        :param cols: End positions of spans, or None to fill all spans inside rows.
+        """
+        variables_count = self.grammar.variables_count
+        if cols is None:
+            rows_count = 0
+            local = self._unpack(self.table, rows, rows)
+            products = None
+        else:
+            rows_count = rows.stop - rows.start
+            local = np.zeros(
+                (variables_count,) + (rows_count + cols.stop - cols.start,) * 2,
+                dtype=bool,
+            )
+            local[:, :rows_count, :rows_count] = self._unpack(self.table, rows, rows)
+            local[:, rows_count:, rows_count:] = self._unpack(self.table, cols, cols)
+            local[:, :rows_count, rows_count:] = self._unpack(self.table, rows, cols)
+            products = self._unpack(self.products, rows, cols)
+        size = local.shape[1]
+        row_bits = pack_bits(local.reshape(-1, size)).reshape(variables_count, size, -1)
+        col_bits = pack_bits(local.transpose(0, 2, 1).reshape(-1, size)).reshape(
+            variables_count, size, -1
+        )
+
+        left_bits, right_bits = self.rule_bodies[:, 0], self.rule_bodies[:, 1]
+        for length in range(1 if products is not None else 2, size):
+            first = max(0, rows_count - length)
+            last = size - length if products is None else min(rows_count, size - length)
+            derived = np.any(
+                row_bits[left_bits, first:last]
+                & col_bits[right_bits, first + length : last + length],
+                axis=-1,
+            )
+            if products is not None:
+                derived |= products.diagonal(length - rows_count, axis1=1, axis2=2)
+            variables, cells = np.nonzero(self.rule_heads @ derived)
+            starts, ends = cells + first, cells + first + length
+            row_bits[variables, starts, ends // WORD_BITS] |= np.uint64(1) << (
+                ends % WORD_BITS
+            ).astype(np.uint64)
+            col_bits[variables, ends, starts // WORD_BITS] |= np.uint64(1) << (
+                starts % WORD_BITS
+            ).astype(np.uint64)
+
+        local = unpack_bits(row_bits.reshape(variables_count * size, -1), size).reshape(
+            variables_count, size, size
+        )
+        if cols is None:
+            self._add(self.table, rows, rows, local)
+        else:
+            self._add(self.table, rows, cols, local[:, :rows_count, rows_count:])
+
+    def complete(self, rows: slice, cols: slice):
+        """Fills the rows x cols block, rows before cols.
+
+        Spans inside rows and inside cols must be filled, and products of the block must hold
+        all splits between rows.stop and cols.start.
+        """
+        rows_count, cols_count = rows.stop - rows.start, cols.stop - cols.start
+        if max(rows_count, cols_count) <= self.leaf_size:
+            self._solve_leaf(rows, cols)
+        elif rows_count >= cols_count:
+            middle = self._middle(rows.start, rows.stop)
+            upper, lower = slice(rows.start, middle), slice(middle, rows.stop)
+            self.complete(lower, cols)
+            self.multiply(upper, lower, cols)
+            self.complete(upper, cols)
+        else:
+            middle = self._middle(cols.start, cols.stop)
+            left, right = slice(cols.start, middle), slice(middle, cols.stop)
+            self.complete(rows, left)
+            self.multiply(rows, left, right)
+            self.complete(rows, right)
+
+    def compute(self, start: int, end: int):
+        """Fills all spans inside positions start..end - 1."""
+        if end - start <= self.leaf_size:
+            self._solve_leaf(slice(start, end))
+            return
+        middle = self._middle(start, end)
+        self.compute(start, middle)
+        self.compute(middle, end)
+        self.complete(slice(start, middle), slice(middle, end))
+
+
+def cyk_valiant(
+    word: str,
+    cfg: Union[CFG, CompiledGrammar],
+    leaf_size: int = VALIANT_LEAF_SIZE,
+) -> bool:
+    """Checks if a word belongs to a given grammar using Valiant's reduction of CYK to boolean
+    matrix multiplication.
+
+    The table is filled recursively: a block of spans is split in halves, the half closer to
+    the diagonal is filled first, and its splits are added to the other half by one matrix
+    product per binary rule. Small blocks are filled directly.
 
     :param word: A word to check.
-    :param cfg: Context Free Grammar.
+    :param cfg: Context Free Grammar, or the grammar compiled with CompiledGrammar.
+    :param leaf_size: Size of blocks filled directly, a positive multiple of 64.
     :return: True if the word belongs to the grammar, False otherwise.
     """
+    if leaf_size < WORD_BITS or leaf_size % WORD_BITS != 0:
+        raise ValueError("Leaf size must be a positive multiple of 64")
+    grammar = cfg if isinstance(cfg, CompiledGrammar) else CompiledGrammar(cfg)
     if len(word) == 0:
-        return cfg.generate_epsilon()
+        return grammar.generates_epsilon
+    if grammar.start_bit is None:
+        return False
+    table = _ValiantTable(word, grammar, leaf_size)
+    table.compute(0, table.size)
+    word_bits = table.table[grammar.start_bit, 0, len(word) // WORD_BITS]
+    return bool(word_bits >> np.uint64(len(word) % WORD_BITS) & np.uint64(1))
 
-    word_length = len(word)
-    cnf = cfg.to_normal_form()
-    dp = dict()
-    for i in range(word_length):
-        dp[i] = dict()
-        for j in range(word_length):
-            dp[i][j] = set()
-
-    length_1 = [prod for prod in cnf.productions if len(prod.body) == 1]
-    length_2 = [prod for prod in cnf.productions if len(prod.body) == 2]
-
-    for i, c in enumerate(word):
-        for p in length_1:
-            if p.body[0].value == c:
-                dp[i][i].add(p.head)
-
-    for st in range(1, word_length):
-        for i in range(word_length - st):
-            j = i + st
-            for k in range(i, j):
-                other_set = set()
-                for p in length_2:
-                    if p.body[0] in dp[i][k] and p.body[1] in dp[k + 1][j]:
-                        other_set.add(p.head)
-                dp[i][j] = dp[i][j] | other_set
-
-    return cfg.start_symbol in dp[0][word_length - 1]
+
+def _cyk_dp(word: str, grammar: CompiledGrammar) -> bool:
+    return bool(cyk_same_length([word], grammar)[0])
+
+
+cyk_algo_map = {"dp": _cyk_dp, "valiant": cyk_valiant}
+
+
+def cyk(word: str, cfg: Union[CFG, CompiledGrammar], algo: str = "dp") -> bool:
+    """Checks if a word belongs to a given grammar using CYK algorithm.
+
+    :param word: A word to check.
+    :param cfg: Context Free Grammar, or the grammar compiled with CompiledGrammar to reuse it for many words.
+    :param algo: "dp" for the span by span table, "valiant" for cyk_valiant, which is faster on long words.
+    :return: True if the word belongs to the grammar, False otherwise.
+    """
+    if algo not in cyk_algo_map:
+        raise ValueError(f"Unknown CYK algorithm: {algo}")
+    grammar = cfg if isinstance(cfg, CompiledGrammar) else CompiledGrammar(cfg)
+    return cyk_algo_map[algo](word, grammar)
+
+
+def _cyk_batch(words: List[str], grammar: CompiledGrammar) -> np.ndarray:
+    result = np.zeros(len(words), dtype=bool)
+    length_to_indices = defaultdict(list)
+    for index, word in enumerate(words):
+        length_to_indices[len(word)].append(index)
+    for indices in length_to_indices.values():
+        result[indices] = cyk_same_length([words[i] for i in indices], grammar)
+    return result
+
+
+def _init_cyk_worker(grammar: CompiledGrammar):
+    _worker_grammar["grammar"] = grammar
+
+
+def _run_cyk_batch(words: List[str]) -> np.ndarray:
+    return _cyk_batch(words, _worker_grammar["grammar"])
+
+
+def _iter_batches(words: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    words = iter(words)
+    while True:
+        batch = list(islice(words, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def cyk_batch(
+    words: Iterable[str],
+    cfg: Union[CFG, CompiledGrammar],
+    batch_size: int = CYK_BATCH_SIZE,
+    processes: int = 1,
+) -> np.ndarray:
+    """Checks membership of many words in one grammar.
+
+    Words are read in batches, and words of the same length in a batch are checked together
+    by cyk_same_length. With several processes, at most 2 * processes batches are read ahead.
+
+    :param words: Iterable of words, e.g. iter_words_from_file.
+    :param cfg: Context Free Grammar, or the grammar compiled with CompiledGrammar.
+    :param batch_size: Number of words in one batch.
+    :param processes: Number of worker processes to check batches in.
+    :return: Boolean array telling whether each word belongs to the grammar, in order of words.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive")
+    if processes < 1:
+        raise ValueError("Number of processes must be positive")
+    grammar = cfg if isinstance(cfg, CompiledGrammar) else CompiledGrammar(cfg)
+    batches = _iter_batches(words, batch_size)
+    if processes == 1:
+        results = [_cyk_batch(batch, grammar) for batch in batches]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_cyk_worker,
+            initargs=(grammar,),
+        ) as executor:
+            results, pending = [], deque()
+            for batch in batches:
+                if len(pending) == 2 * processes:
+                    results.append(pending.popleft().result())
+                pending.append(executor.submit(_run_cyk_batch, batch))
+            results.extend(future.result() for future in pending)
+    return np.concatenate(results) if results else np.zeros(0, dtype=bool)
+
+
+def iter_words_from_file(file: str) -> Iterator[str]:
+    """Reads words from file one by one, one word per line.
+
+    :param file: Path to the file.
+    :return: Iterator of words without line breaks.
+    """
+    with open(file) as f:
+        for line in f:
+            yield line.rstrip("\r\n")
 
 
 def get_word_from_file(file: str) -> str:
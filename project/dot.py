@@ -0,0 +1,152 @@
+import os
+import re
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, List, Tuple, Union
+
+from networkx import MultiDiGraph
+
+from project.compiled_graph import CompiledGraph
+
+DOT_KEYWORDS = {"node", "edge", "graph", "digraph", "subgraph", "strict"}
+DOT_ID_RE = re.compile(
+    r"^(?:[a-zA-Z_\x80-\uffff][a-zA-Z0-9_\x80-\uffff]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))$"
+)
+DOT_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|->|[\[\]=,;{}]|[^\s\[\]=,;{}"]+')
+DOT_ESCAPE_RE = re.compile(r'\\(["\\])')
+INTEGER_RE = re.compile(r"^-?[0-9]+$")
+
+
+@contextmanager
+def _open_text(file: Union[str, IO], mode: str) -> Iterator[IO]:
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, mode) as handle:
+            yield handle
+    else:
+        yield file
+
+
+def quote_dot_id(value) -> str:
+    """
+    :param value: Node id, attribute name or attribute value.
+    :return: Value as DOT ID, quoted if it is not a plain identifier or numeral.
+    """
+    text = str(value)
+    if DOT_ID_RE.match(text) and text.lower() not in DOT_KEYWORDS:
+        return text
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _format_attributes(attributes: Dict) -> str:
+    return ", ".join(
+        f"{quote_dot_id(name)}={quote_dot_id(value)}"
+        for name, value in attributes.items()
+    )
+
+
+def write_dot(graph: Union[MultiDiGraph, CompiledGraph], file: Union[str, IO]):
+    """Writes graph in DOT format line by line, without building it in memory first.
+
+    Output is the same as networkx.drawing.nx_pydot.write_dot gives with classic pydot:
+    one node or edge statement per line, edges with their key and data as attributes.
+
+    :param graph: Graph to write.
+    :param file: Path or text file handle to write to.
+    """
+    with _open_text(file, "w") as handle:
+        handle.write("digraph  {\n")
+        if isinstance(graph, CompiledGraph):
+            for node in graph.node_list:
+                handle.write(f"{quote_dot_id(node)};\n")
+            # Each (from, to, label) occurs once, so the label index is a unique edge key.
+            for node_from, node_to, label in graph.edges(data="label"):
+                handle.write(
+                    f"{quote_dot_id(node_from)} -> {quote_dot_id(node_to)}  "
+                    f"[key={graph.label_to_id[label]}, label={quote_dot_id(label)}];\n"
+                )
+        else:
+            for name, value in graph.graph.items():
+                handle.write(f"{quote_dot_id(name)}={quote_dot_id(value)};\n")
+            for node, data in graph.nodes(data=True):
+                attributes = f" [{_format_attributes(data)}]" if data else ""
+                handle.write(f"{quote_dot_id(node)}{attributes};\n")
+            for node_from, node_to, key, data in graph.edges(keys=True, data=True):
+                attributes = _format_attributes({"key": key, **data})
+                handle.write(
+                    f"{quote_dot_id(node_from)} -> {quote_dot_id(node_to)}  [{attributes}];\n"
+                )
+        handle.write("}\n")
+
+
+def _parse_id(token: str, int_nodes: bool = False):
+    if token.startswith('"'):
+        return DOT_ESCAPE_RE.sub(r"\1", token[1:-1])
+    if int_nodes and INTEGER_RE.match(token):
+        return int(token)
+    return token
+
+
+def _parse_attributes(tokens: List[str]) -> Dict[str, str]:
+    attributes = dict()
+    position = 0
+    while position < len(tokens):
+        if tokens[position] in (",", ";"):
+            position += 1
+            continue
+        name = _parse_id(tokens[position])
+        if position + 2 >= len(tokens) or tokens[position + 1] != "=":
+            raise ValueError(f"Malformed DOT attribute list: {' '.join(tokens)}")
+        attributes[name] = _parse_id(tokens[position + 2])
+        position += 3
+    return attributes
+
+
+def _parse_statement(
+    tokens: List[str], int_nodes: bool
+) -> Tuple[str, Tuple, Dict[str, str]]:
+    attributes = dict()
+    if "[" in tokens:
+        start = tokens.index("[")
+        attributes = _parse_attributes(tokens[start + 1 : tokens.index("]")])
+        tokens = tokens[:start]
+    if len(tokens) == 3 and tokens[1] == "->":
+        return (
+            "edge",
+            (_parse_id(tokens[0], int_nodes), _parse_id(tokens[2], int_nodes)),
+            attributes,
+        )
+    if len(tokens) == 3 and tokens[1] == "=":
+        return "graph", (), {_parse_id(tokens[0]): _parse_id(tokens[2])}
+    if len(tokens) == 1:
+        return "node", (_parse_id(tokens[0], int_nodes),), attributes
+    raise ValueError(f"Unsupported DOT statement: {' '.join(tokens)}")
+
+
+def read_dot(file: Union[str, IO], int_nodes: bool = True) -> MultiDiGraph:
+    """Reads graph written by write_dot line by line.
+
+    Only the subset of DOT that write_dot produces is supported: one statement per line.
+    Edge keys are restored from the "key" attribute, other attribute values are strings.
+
+    :param file: Path or text file handle to read from.
+    :param int_nodes: Whether to read integer node ids as int rather than str.
+    :return: Read graph.
+    """
+    graph = MultiDiGraph()
+    with _open_text(file, "r") as handle:
+        for line in handle:
+            tokens = DOT_TOKEN_RE.findall(line)
+            if not tokens or tokens[-1] in ("{", "}"):
+                continue
+            if tokens[-1] == ";":
+                tokens = tokens[:-1]
+            kind, nodes, attributes = _parse_statement(tokens, int_nodes)
+            if kind == "graph":
+                graph.graph.update(attributes)
+            elif kind == "node":
+                graph.add_node(nodes[0], **attributes)
+            else:
+                key = attributes.pop("key", None)
+                if key is not None and INTEGER_RE.match(key):
+                    key = int(key)
+                graph.add_edge(*nodes, key=key, **attributes)
+    return graph
@@ -0,0 +1,168 @@
+import json
+import os
+import struct
+from typing import Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+from networkx import MultiDiGraph
+
+from project.compiled_graph import CompiledGraph
+
+EDGE_LIST_MAGIC = b"FLCEDGE1"
+EDGE_DTYPE = np.dtype([("source", "<i8"), ("target", "<i8"), ("label", "<i4")])
+FOOTER_SIZE = struct.calcsize("<Q")
+
+
+class EdgeListWriter:
+    """Writes labeled edges with integer nodes into a binary edge list file.
+
+    The file is the magic header, then a fixed-size record (source, target, label index) per
+    edge, then the JSON label table and its length. Labels are indexed in order of their first
+    occurrence, so edges are written as they come and only the label table is kept in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.label_to_id = dict()
+        self.edges_count = 0
+        self._file = open(path, "wb")
+        self._file.write(EDGE_LIST_MAGIC)
+
+    def write_arrays(self, sources: np.ndarray, targets: np.ndarray, labels: List):
+        """
+        :param sources: Source node of every edge.
+        :param targets: Target node of every edge.
+        :param labels: Label of every edge.
+        """
+        records = np.empty(len(sources), dtype=EDGE_DTYPE)
+        records["source"] = sources
+        records["target"] = targets
+        records["label"] = [
+            self.label_to_id.setdefault(label, len(self.label_to_id))
+            for label in labels
+        ]
+        self._file.write(records.tobytes())
+        self.edges_count += len(records)
+
+    def write_edges(self, edges: Iterable[Tuple[int, int, object]]):
+        """
+        :param edges: Iterable of (source, target, label) triples.
+        """
+        for source, target, label in edges:
+            self._file.write(
+                struct.pack(
+                    "<qqi",
+                    source,
+                    target,
+                    self.label_to_id.setdefault(label, len(self.label_to_id)),
+                )
+            )
+            self.edges_count += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        footer = json.dumps(list(self.label_to_id.keys())).encode()
+        self._file.write(footer)
+        self._file.write(struct.pack("<Q", len(footer)))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def write_edge_list(edges: Iterable[Tuple[int, int, object]], path: str) -> int:
+    """Writes edges into a binary edge list file.
+
+    :param edges: Iterable of (source, target, label) triples with integer nodes.
+    :param path: Path to the file.
+    :return: Number of written edges.
+    """
+    with EdgeListWriter(path) as writer:
+        writer.write_edges(edges)
+    return writer.edges_count
+
+
+def write_graph_edge_list(graph: Union[MultiDiGraph, CompiledGraph], path: str) -> int:
+    """Writes graph with integer nodes into a binary edge list file.
+
+    Compiled graphs are written label by label straight from their matrices.
+
+    :param graph: Graph to write.
+    :param path: Path to the file.
+    :return: Number of written edges.
+    """
+    with EdgeListWriter(path) as writer:
+        if isinstance(graph, CompiledGraph):
+            node_ids = np.asarray(graph.node_ids)
+            for label in graph.labels:
+                rows, cols = graph.matrices[label].nonzero()
+                writer.write_arrays(node_ids[rows], node_ids[cols], [label] * len(rows))
+        else:
+            writer.write_edges(graph.edges(data="label"))
+    return writer.edges_count
+
+
+def open_edge_list(path: str) -> Tuple[np.ndarray, List]:
+    """Maps binary edge list file into memory.
+
+    :param path: Path to the file written by EdgeListWriter.
+    :return: Memory-mapped array of EDGE_DTYPE records and the label table.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        if file.read(len(EDGE_LIST_MAGIC)) != EDGE_LIST_MAGIC:
+            raise ValueError(f"{path} is not a binary edge list")
+        file.seek(file_size - FOOTER_SIZE)
+        (footer_size,) = struct.unpack("<Q", file.read(FOOTER_SIZE))
+        records_end = file_size - FOOTER_SIZE - footer_size
+        file.seek(records_end)
+        labels = json.loads(file.read(footer_size))
+
+    records_count = (records_end - len(EDGE_LIST_MAGIC)) // EDGE_DTYPE.itemsize
+    if records_count == 0:
+        return np.empty(0, dtype=EDGE_DTYPE), labels
+    records = np.memmap(
+        path,
+        dtype=EDGE_DTYPE,
+        mode="r",
+        offset=len(EDGE_LIST_MAGIC),
+        shape=(records_count,),
+    )
+    return records, labels
+
+
+def iter_edge_list_chunks(
+    path: str, chunk_size: int = 1 << 20
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, List]]:
+    """
+    :param path: Path to the binary edge list file.
+    :param chunk_size: Number of edges in one chunk.
+    :return: Iterator of (sources, targets, label indices, label table) chunks.
+    """
+    records, labels = open_edge_list(path)
+    for chunk_start in range(0, len(records), chunk_size):
+        chunk = records[chunk_start : chunk_start + chunk_size]
+        yield chunk["source"], chunk["target"], chunk["label"], labels
+
+
+def read_edge_list_graph(path: str) -> MultiDiGraph:
+    """Reads binary edge list file into a graph with "label" edge attribute.
+
+    :param path: Path to the binary edge list file.
+    :return: Read graph.
+    """
+    graph = MultiDiGraph()
+    for sources, targets, label_ids, labels in iter_edge_list_chunks(path):
+        label_values = np.empty(len(labels), dtype=object)
+        label_values[:] = labels
+        graph.add_edges_from(
+            (source, target, {"label": label})
+            for source, target, label in zip(
+                sources.tolist(), targets.tolist(), label_values[label_ids]
+            )
+        )
+    return graph
@@ -0,0 +1,134 @@
+import numpy as np
+from scipy import sparse
+
+from project.bitset import POPCOUNT_TABLE, WORD_BITS, WORD_DTYPE, pack_bits, unpack_bits
+
+DENSE_FRONTIER_DENSITY = 1 / 32
+
+
+class Frontier:
+    """Boolean matrix of BFS front or visited set.
+
+    Stored as CSR while sparse, and as packed uint64 bitsets (one bit per cell) once its density
+    passes the threshold, so dense fronts take 1 bit per cell instead of ~5 bytes per nonzero.
+    """
+
+    def __init__(
+        self,
+        shape,
+        matrix: sparse.csr_matrix = None,
+        words: np.ndarray = None,
+        threshold: float = DENSE_FRONTIER_DENSITY,
+    ):
+        self.shape = shape
+        self.matrix = matrix
+        self.words = words
+        self.threshold = threshold
+        self._adjust()
+
+    @classmethod
+    def from_sparse(
+        cls, matrix, threshold: float = DENSE_FRONTIER_DENSITY
+    ) -> "Frontier":
+        return cls(
+            matrix.shape,
+            matrix=sparse.csr_matrix(matrix, dtype=bool),
+            threshold=threshold,
+        )
+
+    @classmethod
+    def from_words(
+        cls, words: np.ndarray, cols: int, threshold: float = DENSE_FRONTIER_DENSITY
+    ) -> "Frontier":
+        return cls((words.shape[0], cols), words=words, threshold=threshold)
+
+    def is_dense(self) -> bool:
+        return self.words is not None
+
+    @property
+    def nnz(self) -> int:
+        if self.is_dense():
+            return int(POPCOUNT_TABLE[self.words.view(np.uint8)].sum())
+        return self.matrix.nnz
+
+    def density(self) -> float:
+        cells = self.shape[0] * self.shape[1]
+        return self.nnz / cells if cells else 0.0
+
+    def to_words(self) -> np.ndarray:
+        """
+        :return: Frontier as packed bitsets.
+        """
+        if self.is_dense():
+            return self.words
+        rows, cols = self.shape
+        words = np.zeros((rows, -(-cols // WORD_BITS)), dtype=WORD_DTYPE)
+        coo = self.matrix.tocoo()
+        np.bitwise_or.at(
+            words,
+            (coo.row, coo.col // WORD_BITS),
+            np.left_shift(WORD_DTYPE.type(1), (coo.col % WORD_BITS).astype(WORD_DTYPE)),
+        )
+        return words
+
+    def to_sparse(self) -> sparse.csr_matrix:
+        """
+        :return: Frontier as boolean CSR matrix.
+        """
+        if not self.is_dense():
+            return self.matrix
+        return sparse.csr_matrix(unpack_bits(self.words, self.shape[1]))
+
+    def select_rows(self, rows: np.ndarray) -> "Frontier":
+        """
+        :param rows: Row indices.
+        :return: Frontier made of the given rows.
+        """
+        if self.is_dense():
+            return Frontier.from_words(self.words[rows], self.shape[1], self.threshold)
+        return Frontier.from_sparse(self.matrix[rows], self.threshold)
+
+    def difference(self, other: "Frontier") -> "Frontier":
+        """
+        :return: Cells that are set in this frontier, but not in the other one.
+        """
+        if not self.is_dense() and not other.is_dense():
+            return Frontier.from_sparse(self.matrix > other.matrix, self.threshold)
+        if not self.is_dense():
+            coo = self.matrix.tocoo()
+            bits = other.words[coo.row, coo.col // WORD_BITS] >> (
+                coo.col % WORD_BITS
+            ).astype(WORD_DTYPE)
+            is_new = (bits & WORD_DTYPE.type(1)) == 0
+            return Frontier.from_sparse(
+                sparse.csr_matrix(
+                    (
+                        np.ones(is_new.sum(), dtype=bool),
+                        (coo.row[is_new], coo.col[is_new]),
+                    ),
+                    shape=self.shape,
+                ),
+                self.threshold,
+            )
+        return Frontier.from_words(
+            self.words & ~other.to_words(), self.shape[1], self.threshold
+        )
+
+    def union(self, other: "Frontier") -> "Frontier":
+        """
+        :return: Cells that are set in any of the frontiers.
+        """
+        if not self.is_dense() and not other.is_dense():
+            return Frontier.from_sparse(self.matrix + other.matrix, self.threshold)
+        return Frontier.from_words(
+            self.to_words() | other.to_words(), self.shape[1], self.threshold
+        )
+
+    def _adjust(self):
+        density = self.density()
+        if not self.is_dense() and density > self.threshold:
+            self.words = self.to_words()
+            self.matrix = None
+        elif self.is_dense() and density < self.threshold / 2:
+            self.matrix = self.to_sparse()
+            self.words = None
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import cfpq_data
+import pandas as pd
+
+from project.edge_list import EdgeListWriter
+
+GRAPH_CACHE_ENV = "FORMAL_LANG_GRAPH_CACHE"
+DEFAULT_GRAPH_CACHE_DIR = Path.home() / ".cache" / "formal-lang-course" / "graphs"
+INDEX_FILE = "index.json"
+CSV_FILE = "graph.csv"
+EDGE_LIST_FILE = "edges.bin"
+CSV_CHUNK_SIZE = 1 << 20
+
+
+def iter_csv_chunks(
+    path: Union[str, Path], chunk_size: int = CSV_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """Reads a dataset graph CSV ("from to label" per line) in chunks.
+
+    :param path: Path to the CSV file.
+    :param chunk_size: Number of edges read at once.
+    :return: Generator of data frames with columns "from", "to" and "label".
+    """
+    return pd.read_csv(
+        path,
+        sep=" ",
+        header=None,
+        names=["from", "to", "label"],
+        engine="c",
+        dtype={"label": str},
+        chunksize=chunk_size,
+    )
+
+
+class GraphCache:
+    """Content-addressed local cache of dataset graphs.
+
+    Every graph is stored under objects/<sha256 of its CSV> as the raw CSV and a binary edge
+    list (see project.edge_list), and index.json maps graph names to digests. Lookup by name
+    needs neither network nor CSV parsing.
+    """
+
+    def __init__(self, directory: Union[str, Path] = None):
+        """
+        :param directory: (optional) cache directory. Defaults to $FORMAL_LANG_GRAPH_CACHE, or
+                          ~/.cache/formal-lang-course/graphs if it is not set.
+        """
+        if directory is None:
+            directory = os.environ.get(GRAPH_CACHE_ENV, DEFAULT_GRAPH_CACHE_DIR)
+        self.directory = Path(directory)
+
+    def _read_index(self) -> Dict[str, str]:
+        try:
+            with open(self.directory / INDEX_FILE) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return dict()
+
+    def _write_index(self, index: Dict[str, str]):
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(index, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.directory / INDEX_FILE)
+
+    def object_dir(self, digest: str) -> Path:
+        return self.directory / "objects" / digest
+
+    def lookup(self, graph_name: str) -> Optional[Path]:
+        """
+        :param graph_name: Name of the graph.
+        :return: Directory with the cached graph files, or None if the graph is not cached.
+        """
+        digest = self._read_index().get(graph_name)
+        if digest is None:
+            return None
+        object_dir = self.object_dir(digest)
+        if not (object_dir / EDGE_LIST_FILE).exists():
+            return None
+        return object_dir
+
+    def edge_list_path(self, graph_name: str) -> Optional[Path]:
+        """
+        :param graph_name: Name of the graph.
+        :return: Path to the cached binary edge list, or None if the graph is not cached.
+        """
+        object_dir = self.lookup(graph_name)
+        return None if object_dir is None else object_dir / EDGE_LIST_FILE
+
+    def add_csv(self, graph_name: str, csv_path: Union[str, Path]) -> Path:
+        """Stores CSV graph (lines "from to label") in the cache under the given name.
+
+        :param graph_name: Name of the graph.
+        :param csv_path: Path to the CSV file.
+        :return: Directory with the cached graph files.
+        """
+        digest = hashlib.sha256()
+        with open(csv_path, "rb") as file:
+            for block in iter(lambda: file.read(CSV_CHUNK_SIZE), b""):
+                digest.update(block)
+        digest = digest.hexdigest()
+
+        object_dir = self.object_dir(digest)
+        if not (object_dir / EDGE_LIST_FILE).exists():
+            object_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(csv_path, object_dir / CSV_FILE)
+            temp_path = object_dir / (EDGE_LIST_FILE + ".tmp")
+            with EdgeListWriter(str(temp_path)) as writer:
+                for chunk in iter_csv_chunks(object_dir / CSV_FILE):
+                    writer.write_arrays(
+                        chunk["from"].to_numpy(),
+                        chunk["to"].to_numpy(),
+                        chunk["label"].tolist(),
+                    )
+            os.replace(temp_path, object_dir / EDGE_LIST_FILE)
+
+        index = self._read_index()
+        index[graph_name] = digest
+        self._write_index(index)
+        return object_dir
+
+    def fetch(self, graph_name: str) -> Path:
+        """Looks the graph up in the cache and downloads it from the dataset on a miss.
+
+        :param graph_name: Name of the graph in the dataset.
+        :return: Directory with the cached graph files.
+        """
+        object_dir = self.lookup(graph_name)
+        if object_dir is not None:
+            return object_dir
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.add_csv(graph_name, find_graph_csv(cfpq_data.download(graph_name)))
+
+
+def find_graph_csv(path: Union[str, Path]) -> Path:
+    """
+    :param path: Path returned by cfpq_data.download: the CSV file itself, or a directory with it.
+    :return: Path to the CSV file of the graph.
+    """
+    path = Path(path)
+    if path.is_file():
+        return path
+    csv_files = sorted(path.rglob("*.csv"))
+    if not csv_files:
+        raise FileNotFoundError(f"No graph CSV file found in {path}")
+    return csv_files[0]
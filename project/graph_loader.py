@@ -0,0 +1,145 @@
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from project.compiled_graph import CompiledGraph
+from project.edge_list import iter_edge_list_chunks
+from project.graph_cache import (
+    CSV_CHUNK_SIZE,
+    EDGE_LIST_FILE,
+    GraphCache,
+    iter_csv_chunks,
+)
+
+
+class CompiledGraphBuilder:
+    """Builds CompiledGraph from chunks of edges without creating a networkx graph.
+
+    Nodes get indices in order of their first occurrence (source before target), as networkx
+    does when a graph is built from an edge list, and only flat index arrays are kept until
+    build is called.
+    """
+
+    def __init__(self):
+        self.label_to_id = dict()
+        self.nodes_count = 0
+        self._node_chunks = []
+        self._sorted_nodes = np.empty(0, dtype=np.int64)
+        self._sorted_indices = np.empty(0, dtype=np.int64)
+        self._label_ids, self._rows, self._cols = [], [], []
+
+    def _index_nodes(self, nodes: np.ndarray) -> np.ndarray:
+        unique, first_occurrences = np.unique(nodes, return_index=True)
+        positions = np.searchsorted(self._sorted_nodes, unique)
+        is_known = positions < len(self._sorted_nodes)
+        is_known[is_known] = self._sorted_nodes[positions[is_known]] == unique[is_known]
+        new_nodes = unique[~is_known][
+            np.argsort(first_occurrences[~is_known], kind="stable")
+        ]
+
+        if len(new_nodes) > 0:
+            self._node_chunks.append(new_nodes)
+            new_indices = np.arange(
+                self.nodes_count, self.nodes_count + len(new_nodes), dtype=np.int64
+            )
+            self.nodes_count += len(new_nodes)
+            all_nodes = np.concatenate([self._sorted_nodes, new_nodes])
+            order = np.argsort(all_nodes, kind="stable")
+            self._sorted_nodes = all_nodes[order]
+            self._sorted_indices = np.concatenate([self._sorted_indices, new_indices])[
+                order
+            ]
+
+        return self._sorted_indices[np.searchsorted(self._sorted_nodes, nodes)]
+
+    def add_edges(
+        self,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        label_ids: np.ndarray,
+        labels: List,
+    ):
+        """
+        :param sources: Source node of every edge.
+        :param targets: Target node of every edge.
+        :param label_ids: Index of the label of every edge in the labels list.
+        :param labels: Label table of the chunk.
+        """
+        to_global_ids = np.array(
+            [
+                self.label_to_id.setdefault(label, len(self.label_to_id))
+                for label in labels
+            ],
+            dtype=np.int64,
+        )
+        nodes = np.empty(2 * len(sources), dtype=np.result_type(sources, targets))
+        nodes[0::2] = sources
+        nodes[1::2] = targets
+        indices = self._index_nodes(nodes)
+        self._rows.append(indices[0::2])
+        self._cols.append(indices[1::2])
+        self._label_ids.append(to_global_ids[np.asarray(label_ids, dtype=np.int64)])
+
+    def build(self) -> CompiledGraph:
+        """
+        :return: Compiled graph of all added edges.
+        """
+
+        def concatenate(chunks):
+            return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+        return CompiledGraph.from_edges(
+            concatenate(self._node_chunks),
+            self.label_to_id.keys(),
+            concatenate(self._label_ids),
+            concatenate(self._rows),
+            concatenate(self._cols),
+        )
+
+
+def compiled_graph_from_csv(
+    path: Union[str, Path], chunk_size: int = CSV_CHUNK_SIZE
+) -> CompiledGraph:
+    """Reads CSV graph (lines "from to label") chunk by chunk into a compiled graph.
+
+    :param path: Path to the CSV file.
+    :param chunk_size: Number of lines in one chunk.
+    :return: Compiled graph.
+    """
+    builder = CompiledGraphBuilder()
+    for chunk in iter_csv_chunks(path, chunk_size):
+        label_ids, labels = pd.factorize(chunk["label"])
+        builder.add_edges(
+            chunk["from"].to_numpy(), chunk["to"].to_numpy(), label_ids, labels.tolist()
+        )
+    return builder.build()
+
+
+def compiled_graph_from_edge_list(
+    path: Union[str, Path], chunk_size: int = CSV_CHUNK_SIZE
+) -> CompiledGraph:
+    """Reads binary edge list file chunk by chunk into a compiled graph.
+
+    :param path: Path to the file written by EdgeListWriter.
+    :param chunk_size: Number of edges in one chunk.
+    :return: Compiled graph.
+    """
+    builder = CompiledGraphBuilder()
+    for sources, targets, label_ids, labels in iter_edge_list_chunks(
+        str(path), chunk_size
+    ):
+        builder.add_edges(sources, targets, label_ids, labels)
+    return builder.build()
+
+
+def load_compiled_graph(graph_name: str, cache_dir: str = None) -> CompiledGraph:
+    """Same as load_graph, but returns compiled graph and never builds a networkx graph.
+
+    :param graph_name: Name of the graph.
+    :param cache_dir: (optional) cache directory, see GraphCache.
+    :return: Loaded compiled graph.
+    """
+    object_dir = GraphCache(cache_dir).fetch(graph_name)
+    return compiled_graph_from_edge_list(object_dir / EDGE_LIST_FILE)
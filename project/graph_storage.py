@@ -0,0 +1,125 @@
+import json
+import os
+from typing import Union
+
+import numpy as np
+from networkx import MultiDiGraph
+from scipy import sparse
+
+from project.compiled_graph import CompiledGraph
+
+STORAGE_FORMAT = "compiled-graph"
+STORAGE_VERSION = 1
+META_FILE = "meta.json"
+NODES_FILE = "nodes.npy"
+ONES_FILE = "ones.npy"
+
+
+def _index_dtype(max_value: int) -> np.dtype:
+    return np.dtype(np.int32 if max_value < np.iinfo(np.int32).max else np.int64)
+
+
+def _label_file(label_id: int, part: str) -> str:
+    return f"label_{label_id}_{part}.npy"
+
+
+def save_compiled_graph(graph: Union[MultiDiGraph, CompiledGraph], path: str):
+    """Saves graph into the directory in a binary format that open_compiled_graph maps into memory.
+
+    The directory holds meta.json with the label table, the node table (a .npy array when nodes
+    are all integers or all strings, otherwise a JSON list in meta.json) and indptr/indices .npy
+    arrays of the CSR matrix of every label. Labels and non-array nodes must be JSON serializable.
+
+    :param graph: Graph or compiled graph to save.
+    :param path: Path to the directory, it is created if missing.
+    """
+    if not isinstance(graph, CompiledGraph):
+        graph = CompiledGraph.from_graph(graph)
+    os.makedirs(path, exist_ok=True)
+    states_count = graph.number_of_nodes()
+
+    meta = {
+        "format": STORAGE_FORMAT,
+        "version": STORAGE_VERSION,
+        "nodes_count": states_count,
+        "labels": graph.labels,
+        "label_edges_count": np.asarray(graph.label_edges_count).tolist(),
+    }
+    node_ids = np.asarray(graph.node_list)
+    if (
+        states_count > 0
+        and node_ids.ndim == 1
+        and node_ids.dtype.kind in "iuU"
+        and node_ids.tolist() == graph.node_list
+    ):
+        np.save(os.path.join(path, NODES_FILE), node_ids)
+    else:
+        meta["nodes"] = graph.node_list
+
+    max_nnz = 0
+    for label_id, label in enumerate(graph.labels):
+        matrix = sparse.csr_matrix(graph.matrices[label], dtype=bool)
+        matrix.sum_duplicates()
+        max_nnz = max(max_nnz, matrix.nnz)
+        # scipy copies indptr and indices to a common dtype, so both are saved in one.
+        index_dtype = _index_dtype(max(states_count, matrix.nnz))
+        np.save(
+            os.path.join(path, _label_file(label_id, "indptr")),
+            matrix.indptr.astype(index_dtype, copy=False),
+        )
+        np.save(
+            os.path.join(path, _label_file(label_id, "indices")),
+            matrix.indices.astype(index_dtype, copy=False),
+        )
+    # Every label shares a prefix of this array as its CSR data.
+    np.save(os.path.join(path, ONES_FILE), np.ones(max_nnz, dtype=bool))
+
+    with open(os.path.join(path, META_FILE), "w") as file:
+        json.dump(meta, file)
+
+
+def open_compiled_graph(path: str, mmap: bool = True) -> CompiledGraph:
+    """Opens graph saved by save_compiled_graph.
+
+    With mmap the arrays are numpy.memmap views of the files, so opening takes time independent
+    of the graph size, and processes opening the same graph share its pages.
+
+    :param path: Path to the directory with the saved graph.
+    :param mmap: Whether to map arrays read-only into memory instead of reading them.
+    :return: Compiled graph backed by the saved arrays.
+    """
+    with open(os.path.join(path, META_FILE)) as file:
+        meta = json.load(file)
+    if meta.get("format") != STORAGE_FORMAT:
+        raise ValueError(f"{path} does not contain a compiled graph")
+    if meta.get("version") != STORAGE_VERSION:
+        raise ValueError(f"Unsupported compiled graph version: {meta.get('version')}")
+
+    mmap_mode = "r" if mmap else None
+    states_count = meta["nodes_count"]
+    if "nodes" in meta:
+        nodes = meta["nodes"]
+    else:
+        nodes = np.load(os.path.join(path, NODES_FILE), mmap_mode=mmap_mode)
+
+    ones = np.load(os.path.join(path, ONES_FILE), mmap_mode=mmap_mode)
+    matrices = dict()
+    for label_id, label in enumerate(meta["labels"]):
+        indptr = np.load(
+            os.path.join(path, _label_file(label_id, "indptr")), mmap_mode=mmap_mode
+        )
+        indices = np.load(
+            os.path.join(path, _label_file(label_id, "indices")), mmap_mode=mmap_mode
+        )
+        matrices[label] = sparse.csr_matrix(
+            (ones[: len(indices)], indices, indptr),
+            shape=(states_count, states_count),
+            copy=False,
+        )
+
+    return CompiledGraph(
+        nodes,
+        meta["labels"],
+        matrices,
+        np.array(meta["label_edges_count"], dtype=np.int64),
+    )
@@ -1,11 +1,19 @@
-from typing import NamedTuple, Set, Tuple, Union
+from typing import Dict, NamedTuple, Sequence, Set, Tuple, Union
 
 import cfpq_data
-import networkx.drawing.nx_pydot
+import numpy as np
 from networkx import MultiDiGraph
 from typing.io import IO
 from pyformlang.finite_automaton import NondeterministicFiniteAutomaton
 
+from project.compiled_graph import CompiledGraph
+from project.dot import write_dot
+from project.edge_list import read_edge_list_graph
+from project.graph_cache import EDGE_LIST_FILE, GraphCache
+from project.graph_loader import load_compiled_graph
+
+DEGREE_QUANTILES = (0.0, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0)
+
 
 class GraphInfo(NamedTuple):
     """Class representing necessary data from a graph."""
@@ -15,13 +23,37 @@ class GraphInfo(NamedTuple):
     edge_labels: Set[str]
 
 
-def get_graph_info(graph: MultiDiGraph) -> GraphInfo:
+class GraphStatistics(NamedTuple):
+    """Class representing graph statistics used to choose a query algorithm.
+
+    Degrees count distinct (neighbour, label) pairs, density of a label is the share of
+    node pairs connected by an edge with this label.
+    """
+
+    number_of_nodes: int
+    number_of_edges: int
+    label_edges_count: Dict[str, int]
+    label_density: Dict[str, float]
+    out_degree_quantiles: Dict[float, float]
+    in_degree_quantiles: Dict[float, float]
+
+
+def get_graph_info(graph: Union[MultiDiGraph, CompiledGraph]) -> GraphInfo:
     """Extracts number of nodes, edges and present edge labels from a graph.
 
+    Compiled graphs are handled without iterating over edges.
+
     :param graph: Graph for info extraction.
     :return: Graph info.
     """
-    edge_labels = set(label for _, _, label in graph.edges(data="label") if label)
+    if isinstance(graph, CompiledGraph):
+        edge_labels = set(
+            label
+            for label, count in zip(graph.labels, graph.label_edges_count)
+            if label and count > 0
+        )
+    else:
+        edge_labels = set(label for _, _, label in graph.edges(data="label") if label)
     return GraphInfo(
         graph.number_of_nodes(),
         graph.number_of_edges(),
@@ -35,10 +67,50 @@ def get_graph_info_by_name(graph_name: str) -> GraphInfo:
     :param graph_name: Graph name in the dataset.
     :return: Graph info.
     """
-    graph = load_graph(graph_name)
+    graph = load_compiled_graph(graph_name)
     return get_graph_info(graph)
 
 
+def get_graph_statistics(
+    graph: Union[MultiDiGraph, CompiledGraph],
+    quantiles: Sequence[float] = DEGREE_QUANTILES,
+) -> GraphStatistics:
+    """Computes label histogram, label densities and degree quantiles in one pass over label matrices.
+
+    :param graph: Graph for statistics extraction, compiled first if it is a MultiDiGraph.
+    :param quantiles: Quantiles of degree distributions to compute.
+    :return: Graph statistics.
+    """
+    if not isinstance(graph, CompiledGraph):
+        graph = CompiledGraph.from_graph(graph)
+    nodes_count = graph.number_of_nodes()
+    out_degrees = np.zeros(nodes_count, dtype=np.int64)
+    in_degrees = np.zeros(nodes_count, dtype=np.int64)
+    label_density = dict()
+    for label in graph.labels:
+        matrix = graph.matrices[label]
+        out_degrees += np.diff(matrix.indptr)
+        in_degrees += np.bincount(matrix.indices, minlength=nodes_count)
+        label_density[label] = matrix.nnz / nodes_count**2 if nodes_count else 0.0
+
+    def degree_quantiles(degrees: np.ndarray) -> Dict[float, float]:
+        if nodes_count == 0:
+            return {quantile: 0.0 for quantile in quantiles}
+        values = np.quantile(degrees, quantiles)
+        return dict(zip(quantiles, values.tolist()))
+
+    return GraphStatistics(
+        number_of_nodes=nodes_count,
+        number_of_edges=graph.number_of_edges(),
+        label_edges_count=dict(
+            zip(graph.labels, np.asarray(graph.label_edges_count).tolist())
+        ),
+        label_density=label_density,
+        out_degree_quantiles=degree_quantiles(out_degrees),
+        in_degree_quantiles=degree_quantiles(in_degrees),
+    )
+
+
 def build_two_cycle_labeled_graph(
     first_cycle_size: int,
     second_cycle_size: int,
@@ -80,27 +152,32 @@ def build_and_save_two_cycle_labeled_graph(
     save_graph(graph, file)
 
 
-def load_graph(graph_name: str) -> MultiDiGraph:
-    """Loads a graph from dataset.
+def load_graph(graph_name: str, cache_dir: str = None) -> MultiDiGraph:
+    """Loads a graph from dataset through the local graph cache.
+
+    The graph is downloaded and its CSV is parsed only if it is not cached yet.
 
     :param graph_name: Name of the graph.
+    :param cache_dir: (optional) cache directory, see GraphCache.
     :return: Loaded graph.
     """
-    graph_path = cfpq_data.download(graph_name)
-    return cfpq_data.graph_from_csv(graph_path)
+    object_dir = GraphCache(cache_dir).fetch(graph_name)
+    return read_edge_list_graph(str(object_dir / EDGE_LIST_FILE))
 
 
-def save_graph(graph: MultiDiGraph, file: Union[str, IO]):
+def save_graph(graph: Union[MultiDiGraph, CompiledGraph], file: Union[str, IO]):
     """Saves a graph to a specified .dot file.
 
     :param graph: Graph to save.
     :param file: File handle to save with.
     """
-    networkx.drawing.nx_pydot.write_dot(graph, file)
+    write_dot(graph, file)
 
 
 def build_nfa_by_graph(
-    graph: MultiDiGraph, start_nodes: Set = None, final_nodes: Set = None
+    graph: Union[MultiDiGraph, CompiledGraph],
+    start_nodes: Set = None,
+    final_nodes: Set = None,
 ) -> NondeterministicFiniteAutomaton:
     """Builds NFA based on the given graph.
 
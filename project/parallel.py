@@ -0,0 +1,211 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+from typing import Dict, Iterable, Iterator, List, Set, Union
+
+import numpy as np
+from pyformlang.finite_automaton import State
+from scipy import sparse
+
+from project.adjacency_matrix import AdjacencyMatrix, ProductStateIndices, sync_bfs
+
+_worker_state = dict()
+
+
+class SharedLabelMatrices:
+    """Per-label CSR matrices copied once into shared memory.
+
+    Worker processes attach to them by descriptor and build CSR matrices right on top of the
+    shared buffers, so the graph is never copied per worker. Use as a context manager:
+    shared memory is released on exit.
+    """
+
+    def __init__(self, matrices: Dict):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.descriptor = []
+        for label, matrix in matrices.items():
+            matrix = sparse.csr_matrix(matrix, dtype=bool)
+            arrays = [
+                self._share(array)
+                for array in (matrix.data, matrix.indices, matrix.indptr)
+            ]
+            self.descriptor.append((label, matrix.shape, arrays))
+
+    def _share(self, array: np.ndarray):
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        self._blocks.append(block)
+        return block.name, array.dtype.str, array.shape
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def attach_label_matrices(descriptor) -> Dict:
+    """Attaches to matrices shared by SharedLabelMatrices without copying them.
+
+    :param descriptor: SharedLabelMatrices.descriptor.
+    :return: Dict from label to CSR matrix backed by shared memory.
+    """
+    matrices = dict()
+    blocks = _worker_state.setdefault("blocks", [])
+    for label, shape, arrays in descriptor:
+        views = []
+        for name, dtype, array_shape in arrays:
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            views.append(
+                np.ndarray(array_shape, dtype=np.dtype(dtype), buffer=block.buf)
+            )
+        matrices[label] = sparse.csr_matrix(tuple(views), shape=shape, copy=False)
+    return matrices
+
+
+def _close_worker_blocks():
+    _worker_state.pop("first_matrix", None)
+    for block in _worker_state.pop("blocks", []):
+        block.close()
+
+
+def _init_worker(descriptor, states_count: int, final_indices, second_matrix_parts):
+    state_indices, start_states, final_states, matrix = second_matrix_parts
+    util.Finalize(None, _close_worker_blocks, exitpriority=10)
+    first_matrix = AdjacencyMatrix()
+    first_matrix.state_indices = ProductStateIndices(states_count)
+    first_matrix.index_to_state = first_matrix.state_indices
+    first_matrix.final_states = set(final_indices.tolist())
+    first_matrix.matrix = attach_label_matrices(descriptor)
+    _worker_state["first_matrix"] = first_matrix
+    _worker_state["second_matrix"] = AdjacencyMatrix(
+        state_to_index=state_indices,
+        start_states=start_states,
+        final_states=final_states,
+        matrix=matrix,
+    )
+
+
+def _run_batch(start_indices: np.ndarray, all_reachable: bool):
+    result = sync_bfs(
+        _worker_state["first_matrix"],
+        _worker_state["second_matrix"],
+        all_reachable,
+        start_states=start_indices.tolist(),
+    )
+    if all_reachable:
+        return {
+            start: np.fromiter(ends, dtype=np.int64, count=len(ends))
+            for start, ends in result.items()
+        }
+    return np.fromiter(result, dtype=np.int64, count=len(result))
+
+
+def iter_parallel_sync_bfs(
+    first_matrix: AdjacencyMatrix,
+    second_matrix: AdjacencyMatrix,
+    all_reachable: bool = False,
+    workers: int = 2,
+    batch_size: int = None,
+    start_states: Iterable[State] = None,
+) -> Iterator[Union[Set[State], Dict[State, Set[State]]]]:
+    """Runs sync_bfs over disjoint batches of start states in worker processes.
+
+    At most 2 * workers batches are submitted ahead of the consumer, and batches not yet
+    started are cancelled when the iterator is closed early.
+
+    :param workers: Number of worker processes.
+    :param batch_size: Number of start states in one batch. Defaults to splitting start states in 4 batches per worker.
+    :param start_states: (optional) start states of the first NFA to run BFS from. Defaults to all of them.
+    :return: Results of sync_bfs for every batch, in order of batches.
+    """
+    if workers < 1:
+        raise ValueError("Number of workers must be positive")
+    start_indices = np.sort(
+        first_matrix.indices_by_states(
+            first_matrix.start_states if start_states is None else start_states
+        )
+    )
+    if len(start_indices) == 0:
+        return
+    if batch_size is None:
+        batch_size = -(-len(start_indices) // (4 * workers))
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive")
+    batches = (
+        start_indices[batch_start : batch_start + batch_size]
+        for batch_start in range(0, len(start_indices), batch_size)
+    )
+    max_pending = 2 * workers
+
+    def convert(result):
+        if all_reachable:
+            return {
+                first_matrix.state_by_index(start): set(
+                    first_matrix.states_by_indices(ends)
+                )
+                for start, ends in result.items()
+            }
+        return set(first_matrix.states_by_indices(result))
+
+    with SharedLabelMatrices(first_matrix.matrix) as shared, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            shared.descriptor,
+            first_matrix.get_states_count(),
+            first_matrix.get_final_indices(),
+            (
+                second_matrix.state_indices,
+                second_matrix.start_states,
+                second_matrix.final_states,
+                dict(second_matrix.matrix),
+            ),
+        ),
+    ) as executor:
+        pending = deque()
+        try:
+            for batch in batches:
+                if len(pending) == max_pending:
+                    yield convert(pending.popleft().result())
+                pending.append(executor.submit(_run_batch, batch, all_reachable))
+            while pending:
+                yield convert(pending.popleft().result())
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def parallel_sync_bfs(
+    first_matrix: AdjacencyMatrix,
+    second_matrix: AdjacencyMatrix,
+    all_reachable: bool = False,
+    workers: int = 2,
+    batch_size: int = None,
+) -> Union[Set[State], Dict[State, Set[State]]]:
+    """Same as sync_bfs, but start states are split in batches processed by worker processes.
+
+    Per-label graph matrices are shared with workers through shared memory, not copied.
+
+    :param all_reachable: Specifies whether for each start node will be returned a set of reachable nodes as Dict,
+                          or all reachable nodes as Set from the given start nodes set.
+    :param workers: Number of worker processes.
+    :param batch_size: Number of start states in one batch. Defaults to splitting start states in 4 batches per worker.
+    :return: Reachable nodes depending on all_reachable flag.
+    """
+    results = iter_parallel_sync_bfs(
+        first_matrix, second_matrix, all_reachable, workers, batch_size
+    )
+    if all_reachable:
+        merged = dict()
+        for result in results:
+            merged.update(result)
+        return merged
+    return set().union(*results)
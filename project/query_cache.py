@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from typing import NamedTuple, Union
+
+from pyformlang.finite_automaton import DeterministicFiniteAutomaton
+from pyformlang.regular_expression import Regex
+
+from project.adjacency_matrix import AdjacencyMatrix
+from project.regex import regex_to_min_dfa
+
+
+class CompiledQuery(NamedTuple):
+    """Minimal DFA of a regular query together with its adjacency matrix.
+
+    Instances are shared between callers and must not be mutated.
+    """
+
+    dfa: DeterministicFiniteAutomaton
+    matrix: AdjacencyMatrix
+
+
+def normalize_regex(regex: str) -> str:
+    """Normalizes regex text, so that equal queries written differently share a cache entry.
+
+    :param regex: String representation of a regex.
+    :return: Regex with surrounding whitespace stripped and inner whitespace runs collapsed to a single space.
+    """
+    return " ".join(regex.split())
+
+
+def compile_query_uncached(regex: Union[str, Regex]) -> CompiledQuery:
+    """Builds minimal DFA and its adjacency matrix for the given regex.
+
+    :param regex: String representation of a regex, or a regex itself.
+    :return: Compiled query.
+    """
+    dfa = regex_to_min_dfa(regex)
+    return CompiledQuery(dfa=dfa, matrix=AdjacencyMatrix(dfa))
+
+
+class QueryCache:
+    """Bounded LRU cache of compiled regular queries keyed by normalized regex text."""
+
+    def __init__(self, max_size: int = 256):
+        if max_size < 1:
+            raise ValueError("Cache size must be positive")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, regex: str) -> CompiledQuery:
+        """
+        :param regex: String representation of a regex.
+        :return: Compiled query, built on a miss and taken from the cache on a hit.
+        """
+        key = normalize_regex(regex)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        compiled = compile_query_uncached(key)
+        self._entries[key] = compiled
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        """Drops all entries and resets hit/miss counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, regex: str) -> bool:
+        return normalize_regex(regex) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+query_cache = QueryCache()
+
+
+def compile_query(regex: Union[str, Regex]) -> CompiledQuery:
+    """Compiles regular query through the shared query_cache.
+
+    Regex objects are compiled without caching, since they have no text to key on.
+
+    :param regex: String representation of a regex, or a regex itself.
+    :return: Compiled query.
+    """
+    if isinstance(regex, str):
+        return query_cache.get(regex)
+    return compile_query_uncached(regex)
@@ -1,73 +1,147 @@
-from typing import Iterable, Union, Set, Dict
+from typing import Iterable, Iterator, Union, Set, Dict, Tuple
 
 import networkx as nx
+import numpy as np
 
-from project import build_nfa_by_graph, regex_to_min_dfa
 from project.adjacency_matrix import (
     AdjacencyMatrix,
     intersect_adjacency_matrices,
     sync_bfs,
+    LazyKroneckerProduct,
 )
+from project.compiled_graph import CompiledGraph
+from project.parallel import iter_parallel_sync_bfs, parallel_sync_bfs
+from project.query_cache import compile_query
 
 
 def rpq_tensor(
-    graph: nx.MultiDiGraph,
+    graph: Union[nx.MultiDiGraph, CompiledGraph],
     query: str,
     start_nodes: set = None,
     final_nodes: set = None,
+    closure_strategy: str = "auto",
+    lazy: bool = False,
 ):
     """Calculates Regular Path Querying using tensor multiplication from given graph and regular expression.
-    :param graph: Graph to send query to.
+    :param graph: Graph to send query to, or the graph compiled once with CompiledGraph.
     :param query: A graph query.
     :param start_nodes: Set of start nodes of the graph.
     :param final_nodes: Set of final nodes of the graph.
+    :param closure_strategy: Transitive closure strategy, see project.transitive_closure.
+    :param lazy: If True, the Kronecker product is never built: reachability from start states is
+                 computed on LazyKroneckerProduct instead, and closure_strategy is ignored.
     :return: Regular Path Querying as set.
     """
-    nfa = build_nfa_by_graph(graph, start_nodes, final_nodes)
-    dfa = regex_to_min_dfa(query)
+    graph_matrix = AdjacencyMatrix.from_graph(graph, start_nodes, final_nodes)
+    query_matrix = compile_query(query).matrix
 
-    graph_matrix = AdjacencyMatrix(nfa)
-    query_matrix = AdjacencyMatrix(dfa)
+    if lazy:
+        product = LazyKroneckerProduct(graph_matrix, query_matrix)
+        start_indices = product.get_start_indices()
+        source_positions, cols = product.closure_rows(start_indices).nonzero()
+        rows = start_indices[source_positions]
+        is_answer = np.isin(cols, product.get_final_indices())
+    else:
+        intersected_matrix = intersect_adjacency_matrices(graph_matrix, query_matrix)
+        transitive_closure = intersected_matrix.make_transitive_closure(
+            closure_strategy
+        )
+        rows, cols = transitive_closure.nonzero()
+        is_answer = np.isin(rows, intersected_matrix.get_start_indices()) & np.isin(
+            cols, intersected_matrix.get_final_indices()
+        )
+    query_states_count = query_matrix.get_states_count()
+    states_from = graph_matrix.states_by_indices(rows[is_answer] // query_states_count)
+    states_to = graph_matrix.states_by_indices(cols[is_answer] // query_states_count)
 
-    intersected_matrix = intersect_adjacency_matrices(graph_matrix, query_matrix)
-    transitive_closure = intersected_matrix.make_transitive_closure()
+    result = {
+        (state_from.value, state_to.value)
+        for state_from, state_to in zip(states_from, states_to)
+    }
 
-    start_states = intersected_matrix.get_start_states()
-    final_states = intersected_matrix.get_final_states()
+    return result
 
-    result = set()
 
-    for state_from, state_to in zip(*transitive_closure.nonzero()):
-        if state_from in start_states and state_to in final_states:
-            result.add(
-                (
-                    state_from // query_matrix.get_states_count(),
-                    state_to // query_matrix.get_states_count(),
-                )
-            )
+def iter_rpq_bfs(
+    query: str,
+    graph: Union[nx.MultiDiGraph, CompiledGraph],
+    start_nodes: Iterable[int] = None,
+    final_nodes: Iterable[int] = None,
+    batch_size: int = 1024,
+    workers: int = 1,
+) -> Iterator[Tuple[int, Set[int]]]:
+    """Calculates Regular Path Querying for every start node separately, running multiple source BFS
+    over batches of start nodes, so that memory is bounded by the batch size rather than by the number of start nodes.
+    :param graph: Graph to send query to, or the graph compiled once with CompiledGraph.
+    :param query: A graph query.
+    :param start_nodes: Set of start nodes of the graph.
+    :param final_nodes: Set of final nodes of the graph.
+    :param batch_size: Number of start nodes processed by one BFS.
+    :param workers: Number of worker processes to run batches in, see project.parallel.
+    :return: Generator of pairs (start node, set of nodes reachable from it). Arguments are checked
+             and the matrices are built before it is returned.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive")
+    am1 = AdjacencyMatrix.from_graph(graph, start_nodes, final_nodes)
+    am2 = compile_query(query).matrix
+    return _iter_batch_results(am1, am2, batch_size, workers)
 
-    return result
+
+def _iter_batch_results(
+    am1: AdjacencyMatrix, am2: AdjacencyMatrix, batch_size: int, workers: int
+) -> Iterator[Tuple[int, Set[int]]]:
+    if workers > 1:
+        results = iter_parallel_sync_bfs(
+            am1, am2, all_reachable=True, workers=workers, batch_size=batch_size
+        )
+    else:
+        start_states = list(am1.get_start_states())
+        results = (
+            sync_bfs(
+                am1,
+                am2,
+                all_reachable=True,
+                start_states=start_states[batch_start : batch_start + batch_size],
+            )
+            for batch_start in range(0, len(start_states), batch_size)
+        )
+    for result in results:
+        for start, ends in result.items():
+            yield start.value, {end.value for end in ends}
 
 
 def rpq_bfs(
     query: str,
-    graph: nx.MultiDiGraph,
+    graph: Union[nx.MultiDiGraph, CompiledGraph],
     start_nodes: Iterable[int] = None,
     final_nodes: Iterable[int] = None,
     all_reachable: bool = False,
-) -> Union[Set[int], Dict[int, Set[int]]]:
+    batch_size: int = None,
+    workers: int = 1,
+) -> Union[Set[int], Dict[int, Set[int]], Iterator[Tuple[int, Set[int]]]]:
     """Calculates Regular Path Querying using multiple source BFS from given graph and regular expression.
-    :param graph: Graph to send query to.
+    :param graph: Graph to send query to, or the graph compiled once with CompiledGraph.
     :param query: A graph query.
     :param start_nodes: Set of start nodes of the graph.
     :param final_nodes: Set of final nodes of the graph.
     :param all_reachable: [Used in sync_bfs function] Specifies whether for each start node will be returned a set of reachable
                           nodes as Dict, or all reachable nodes as Set from the given start nodes set (True for Set, False for Dict).
+    :param batch_size: (optional) used with all_reachable. If set, start nodes are processed in batches of this size and
+                       the result is streamed as a generator of (start node, reachable nodes) pairs, see iter_rpq_bfs.
+    :param workers: Number of worker processes. If greater than 1, start nodes are split in batches
+                    processed in parallel, see project.parallel. The result is the same as the sequential one.
     :return: Regular Path Querying in format depending on all_reachable flag.
     """
-    am1 = AdjacencyMatrix(build_nfa_by_graph(graph, start_nodes, final_nodes))
-    am2 = AdjacencyMatrix(regex_to_min_dfa(query))
-    result = sync_bfs(am1, am2, all_reachable)
+    if all_reachable and batch_size is not None:
+        return iter_rpq_bfs(query, graph, start_nodes, final_nodes, batch_size, workers)
+    am1 = AdjacencyMatrix.from_graph(graph, start_nodes, final_nodes)
+    am2 = compile_query(query).matrix
+    result = (
+        parallel_sync_bfs(am1, am2, all_reachable, workers, batch_size)
+        if workers > 1
+        else sync_bfs(am1, am2, all_reachable)
+    )
     return (
         {start.value: {end.value for end in ends} for (start, ends) in result.items()}
         if all_reachable
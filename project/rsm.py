@@ -38,7 +38,7 @@ def build_adjacency_matrix_from_rsm(rsm: RSM) -> AdjacencyMatrix:
                 start_states.add(state)
             if s in dfa.final_states:
                 final_states.add(state)
-    states = sorted(states, key=lambda s: s.value)
+    states = sorted(states, key=lambda s: (str(s.value[0]), str(s.value[1])))
     state_to_idx = {s: i for i, s in enumerate(states)}
     b_mtx = defaultdict(lambda: dok_matrix((len(states), len(states)), dtype=bool))
     for nonterm, dfa in rsm.boxes.items():
@@ -0,0 +1,152 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+SQUARING_MAX_SIZE = 512
+SQUARING_MIN_DENSITY = 0.01
+CONDENSATION_MAX_AVERAGE_DEGREE = 2.0
+
+
+def _to_bool_csr(matrix) -> sparse.csr_matrix:
+    result = sparse.csr_matrix(matrix, dtype=bool)
+    result.eliminate_zeros()
+    return result
+
+
+def closure_by_squaring(matrix) -> sparse.csr_matrix:
+    """Calculates transitive closure by repeated squaring, i.e. result += result @ result.
+
+    Needs logarithmic number of iterations, but every iteration multiplies the whole result.
+
+    :param matrix: Square boolean matrix.
+    :return: Transitive closure as boolean CSR matrix.
+    """
+    result = _to_bool_csr(matrix)
+    while True:
+        prev_nnz = result.nnz
+        result = result + result @ result
+        if result.nnz == prev_nnz:
+            return result
+
+
+def closure_semi_naive(matrix) -> sparse.csr_matrix:
+    """Calculates transitive closure by semi-naive iteration: only the paths found
+    on the previous iteration are extended by one more edge.
+
+    :param matrix: Square boolean matrix.
+    :return: Transitive closure as boolean CSR matrix.
+    """
+    edges = _to_bool_csr(matrix)
+    result = edges.copy()
+    delta = edges
+    while delta.nnz != 0:
+        delta = (delta @ edges) > result
+        result = result + delta
+    return result
+
+
+def _dag_reachability(dag: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Collects reachable vertices of every DAG vertex in reverse topological order.
+
+    Row of a vertex is the union of its successors and their already collected rows, so
+    vertices with one successor (chains) only copy a row and total work follows the size
+    of the result.
+
+    :param dag: Adjacency matrix of a directed acyclic graph.
+    :return: Boolean matrix of pairs connected by a non-empty path.
+    """
+    size = dag.shape[0]
+    reversed_dag = dag.T.tocsr()
+    out_degree = np.diff(dag.indptr)
+    rows = [None] * size
+    level = np.flatnonzero(out_degree == 0)
+    while len(level) > 0:
+        for vertex in level.tolist():
+            successors = dag.indices[dag.indptr[vertex] : dag.indptr[vertex + 1]]
+            if len(successors) == 0:
+                rows[vertex] = successors
+            elif len(successors) == 1:
+                rows[vertex] = np.concatenate([successors, rows[successors[0]]])
+            else:
+                rows[vertex] = np.unique(
+                    np.concatenate([successors] + [rows[s] for s in successors])
+                )
+
+        predecessors = reversed_dag[level].indices
+        np.subtract.at(out_degree, predecessors, 1)
+        candidates = np.unique(predecessors)
+        level = candidates[out_degree[candidates] == 0]
+
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.concatenate(rows) if size > 0 else np.empty(0, dtype=np.int64)
+    reachability = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), indices, indptr), shape=(size, size)
+    )
+    reachability.sort_indices()
+    return reachability
+
+
+def closure_by_condensation(matrix) -> sparse.csr_matrix:
+    """Calculates transitive closure by condensing strongly connected components and
+    propagating reachability over the resulting DAG.
+
+    :param matrix: Square boolean matrix.
+    :return: Transitive closure as boolean CSR matrix.
+    """
+    edges = _to_bool_csr(matrix)
+    size = edges.shape[0]
+    components_count, components = connected_components(
+        edges, directed=True, connection="strong"
+    )
+    membership = sparse.csr_matrix(
+        (np.ones(size, dtype=bool), (np.arange(size), components)),
+        shape=(size, components_count),
+    )
+    condensed = (membership.T @ edges @ membership).tocsr()
+    cyclic = condensed.diagonal()
+    condensed.setdiag(False)
+    condensed.eliminate_zeros()
+
+    reachability = _dag_reachability(condensed) + sparse.diags(
+        cyclic, dtype=bool, format="csr"
+    )
+    return _to_bool_csr(membership @ reachability @ membership.T)
+
+
+CLOSURE_STRATEGIES = {
+    "squaring": closure_by_squaring,
+    "semi_naive": closure_semi_naive,
+    "condensation": closure_by_condensation,
+}
+
+
+def choose_closure_strategy(matrix) -> str:
+    """Chooses transitive closure strategy by the size and density of the matrix.
+
+    Small or dense matrices are squared, very sparse ones (chains, trees) are condensed,
+    everything else is closed semi-naively.
+
+    :param matrix: Square boolean matrix.
+    :return: Name of the strategy from CLOSURE_STRATEGIES.
+    """
+    size = matrix.shape[0]
+    if size <= SQUARING_MAX_SIZE or matrix.nnz >= SQUARING_MIN_DENSITY * size * size:
+        return "squaring"
+    if matrix.nnz <= CONDENSATION_MAX_AVERAGE_DEGREE * size:
+        return "condensation"
+    return "semi_naive"
+
+
+def transitive_closure(matrix, strategy: str = "auto") -> sparse.csr_matrix:
+    """Calculates transitive closure (paths of length at least one) of the boolean matrix.
+
+    :param matrix: Square boolean matrix.
+    :param strategy: One of CLOSURE_STRATEGIES names, or "auto" to choose by the matrix shape.
+    :return: Transitive closure as boolean CSR matrix.
+    """
+    if strategy == "auto":
+        strategy = choose_closure_strategy(matrix)
+    if strategy not in CLOSURE_STRATEGIES:
+        raise ValueError(f"Unknown transitive closure strategy: {strategy}")
+    return CLOSURE_STRATEGIES[strategy](matrix)
@@ -4,7 +4,13 @@ from pyformlang.finite_automaton import (
     DeterministicFiniteAutomaton,
 )
 
-from project import AdjacencyMatrix, intersect_adjacency_matrices, am_to_nfa
+from project import (
+    AdjacencyMatrix,
+    intersect_adjacency_matrices,
+    am_to_nfa,
+    build_nfa_by_graph,
+    build_two_cycle_labeled_graph,
+)
 
 
 def make_nfa():
@@ -64,3 +70,57 @@ def test_intersection():
     intersected_bm = intersect_adjacency_matrices(am1, am2)
     actual_fa = am_to_nfa(intersected_bm)
     assert actual_fa.is_equivalent_to(expected_fa)
+
+
+def test_from_graph_matches_nfa():
+    graph = build_two_cycle_labeled_graph(
+        first_cycle_size=3, second_cycle_size=2, edge_labels=("A", "B")
+    )
+    graph.add_edge(0, 1, label="A")
+    start_nodes, final_nodes = {0, 1}, {2, 4}
+    from_nfa = AdjacencyMatrix(build_nfa_by_graph(graph, start_nodes, final_nodes))
+    from_graph = AdjacencyMatrix.from_graph(graph, start_nodes, final_nodes)
+
+    assert from_graph.get_start_states() == from_nfa.get_start_states()
+    assert from_graph.get_final_states() == from_nfa.get_final_states()
+    assert from_graph.matrix.keys() == from_nfa.matrix.keys()
+    for label, matrix in from_nfa.matrix.items():
+        expected = {
+            (from_nfa.state_by_index(i), from_nfa.state_by_index(j))
+            for i, j in zip(*matrix.nonzero())
+        }
+        actual = {
+            (from_graph.state_by_index(i), from_graph.state_by_index(j))
+            for i, j in zip(*from_graph.matrix[label].nonzero())
+        }
+        assert actual == expected
+        assert from_graph.matrix[label].nnz == matrix.nnz
+
+
+def test_states_by_indices():
+    am = AdjacencyMatrix(make_nfa())
+    indices = am.indices_by_states([State(3), State(0), State(2)])
+    assert am.states_by_indices(indices) == [State(3), State(0), State(2)]
+    assert all(am.state_by_index(am.index_by_state(s)) == s for s in am.get_states())
+
+
+def test_intersection_product_states():
+    fa1 = make_nfa()
+    fa1.add_start_state(State(0))
+    fa1.add_final_state(State(2))
+    fa1.add_final_state(State(3))
+    fa2 = NondeterministicFiniteAutomaton()
+    fa2.add_transitions([(0, "A", 1), (1, "B", 2)])
+    fa2.add_start_state(State(0))
+    fa2.add_final_state(State(2))
+    am1, am2 = AdjacencyMatrix(fa1), AdjacencyMatrix(fa2)
+
+    intersected = intersect_adjacency_matrices(am1, am2)
+    size = am2.get_states_count()
+    assert intersected.get_states_count() == am1.get_states_count() * size
+    assert intersected.get_start_states() == {am1.index_by_state(0) * size}
+    assert intersected.get_final_states() == {
+        am1.index_by_state(final) * size + am2.index_by_state(2) for final in (2, 3)
+    }
+    assert intersected.state_by_index(5) == 5
+    assert intersected.states_by_indices([3, 1]) == [3, 1]
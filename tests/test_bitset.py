@@ -0,0 +1,17 @@
+from scipy import sparse
+
+from project import pack_bits, unpack_bits
+
+
+def test_pack_unpack():
+    matrix = sparse.random(10, 130, density=0.3, random_state=0).toarray() > 0
+    words = pack_bits(matrix)
+    assert words.shape == (10, 3)
+    assert (unpack_bits(words, 130) == matrix).all()
+
+
+def test_pack_unpack_single_word():
+    matrix = sparse.random(3, 40, density=0.5, random_state=1).toarray() > 0
+    words = pack_bits(matrix)
+    assert words.shape == (3, 1)
+    assert (unpack_bits(words, 40) == matrix).all()
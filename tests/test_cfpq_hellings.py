@@ -44,3 +44,33 @@ def test_cfpq_hellings_3():
         )
         == reachable_pairs
     )
+
+
+def test_cfpq_hellings_4():
+    cfg_as_text = """
+            S -> a S b | a b
+            """
+    graph = build_two_cycle_labeled_graph(2, 1, ("a", "b"))
+    reachable_pairs = {(0, 0), (2, 0), (1, 0), (0, 3), (2, 3), (1, 3)}
+    assert (
+        run_cfpq(algo="hellings", graph=graph, cfg=CFG.from_text(cfg_as_text))
+        == reachable_pairs
+    )
+
+
+def test_cfpq_hellings_start_nodes():
+    cfg = CFG.from_text(
+        """
+            S -> A B | epsilon
+            A -> a | a A
+            B -> b B | b | S
+            """
+    )
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 4, label="b")
+    graph.add_edge(7, 8, label="a")
+    full = run_cfpq(algo="hellings", graph=graph, cfg=cfg)
+    for start_nodes in [{0}, {4, 5}, {7}]:
+        assert run_cfpq(
+            algo="hellings", graph=graph, cfg=cfg, start_nodes=start_nodes
+        ) == {(i, j) for i, j in full if i in start_nodes}
@@ -1,6 +1,6 @@
-from pyformlang.cfg import CFG
+from pyformlang.cfg import CFG, Variable
 
-from project import build_two_cycle_labeled_graph, run_cfpq
+from project import build_two_cycle_labeled_graph, run_cfpq, run_matrix_algo
 
 
 def test_cfpq_matrix_1():
@@ -44,3 +44,52 @@ def test_cfpq_matrix_3():
         )
         == reachable_pairs
     )
+
+
+def test_cfpq_matrix_stats():
+    cfg = CFG.from_text("S -> a S b | a b")
+    graph = build_two_cycle_labeled_graph(2, 1, ("a", "b"))
+    result, stats = run_matrix_algo(cfg, graph, return_stats=True)
+    assert {(i, j) for i, var, j in result if var == Variable("S")} == {
+        (0, 0),
+        (2, 0),
+        (1, 0),
+        (0, 3),
+        (2, 3),
+        (1, 3),
+    }
+    assert stats.iterations == len(stats.delta_nnz) - 1
+    assert stats.delta_nnz[-1] == 0
+    assert sum(stats.delta_nnz) == len(result)
+
+
+def test_cfpq_constraints_do_not_mutate_graph():
+    cfg = CFG.from_text("S -> A B\nA -> a | a A\nB -> b")
+    graph = build_two_cycle_labeled_graph(2, 1, ("a", "b"))
+    nodes_before = list(graph.nodes(data=True))
+    for algo in ["hellings", "matrix", "tensor", "multiple_source"]:
+        assert run_cfpq(algo, graph, cfg, start_nodes={1, 2}, final_nodes={3}) == {
+            (1, 3),
+            (2, 3),
+        }
+        assert run_cfpq(
+            algo, graph, cfg, start_nodes={0}, start_symbol=Variable("A")
+        ) == {(0, 1), (0, 2), (0, 0)}
+    assert list(graph.nodes(data=True)) == nodes_before
+
+
+def test_cfpq_matrix_prunes_by_start_nodes():
+    cfg = CFG.from_text("S -> a S b | a b")
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    other = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edges_from(
+        (i + 10, j + 10, data) for i, j, data in other.edges(data=True)
+    )
+    full, full_stats = run_matrix_algo(
+        cfg, graph, start_symbol=Variable("S"), return_stats=True
+    )
+    result, stats = run_matrix_algo(
+        cfg, graph, start_nodes={0}, start_symbol=Variable("S"), return_stats=True
+    )
+    assert result == {triple for triple in full if triple[0] == 0}
+    assert sum(stats.delta_nnz) < sum(full_stats.delta_nnz)
@@ -0,0 +1,77 @@
+from pyformlang.cfg import CFG, Variable
+
+from project import (
+    build_two_cycle_labeled_graph,
+    run_cfpq,
+    run_hellings_algo,
+    run_multiple_source_algo,
+)
+
+
+def test_cfpq_multiple_source_1():
+    cfg_as_text = """
+            S -> a S
+            S -> epsilon
+            """
+    graph = build_two_cycle_labeled_graph(1, 1, ("a", "b"))
+    reachable_pairs = {(0, 1), (0, 0)}
+    assert (
+        run_cfpq(
+            algo="multiple_source",
+            graph=graph,
+            cfg=CFG.from_text(cfg_as_text),
+            start_nodes={0},
+        )
+        == reachable_pairs
+    )
+
+
+def test_cfpq_multiple_source_2():
+    cfg_as_text = """
+            S -> a S b | a b
+            """
+    graph = build_two_cycle_labeled_graph(2, 1, ("a", "b"))
+    reachable_pairs = {(2, 0), (2, 3), (1, 0), (1, 3)}
+    assert (
+        run_cfpq(
+            algo="multiple_source",
+            graph=graph,
+            cfg=CFG.from_text(cfg_as_text),
+            start_nodes={1, 2},
+        )
+        == reachable_pairs
+    )
+
+
+def test_cfpq_multiple_source_matches_hellings():
+    cfg = CFG.from_text(
+        """
+            S -> A B | epsilon
+            A -> a | a A
+            B -> b B | b | S
+            """
+    )
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 4, label="b")
+    for start_nodes in [set(), {0}, {1, 3}, None]:
+        assert run_cfpq(
+            algo="multiple_source", graph=graph, cfg=cfg, start_nodes=start_nodes
+        ) == run_cfpq(algo="hellings", graph=graph, cfg=cfg, start_nodes=start_nodes)
+
+
+def test_cfpq_multiple_source_direct_start_symbol():
+    cfg = CFG.from_text(
+        """
+            S -> A B | epsilon
+            A -> a | a A
+            B -> b B | b | S
+            """
+    )
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    start_symbol = Variable("B")
+    expected = run_hellings_algo(cfg, graph, start_nodes={4}, start_symbol=start_symbol)
+    assert expected
+    assert (
+        run_multiple_source_algo(cfg, graph, start_nodes={4}, start_symbol=start_symbol)
+        == expected
+    )
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from pyformlang.cfg import CFG, Variable
+
+from project import (
+    CFPQMatrices,
+    CFPQPairs,
+    algo_map,
+    build_two_cycle_labeled_graph,
+    run_cfpq,
+)
+
+ALGOS = ["hellings", "matrix", "tensor", "multiple_source"]
+
+
+def make_query():
+    cfg = CFG.from_text("S -> a S b | a b")
+    graph = build_two_cycle_labeled_graph(2, 1, ("a", "b"))
+    return graph, cfg
+
+
+@pytest.mark.parametrize("algo", ALGOS)
+def test_matrix_result_format(algo):
+    graph, cfg = make_query()
+    result = run_cfpq(algo, graph, cfg, result_format="matrix")
+    assert isinstance(result, CFPQMatrices)
+    rows, cols = result.matrices[Variable("S")].nonzero()
+    nodes = list(result.nodes)
+    assert {(nodes[i], nodes[j]) for i, j in zip(rows, cols)} == run_cfpq(
+        algo, graph, cfg
+    )
+
+
+@pytest.mark.parametrize("algo", ALGOS)
+def test_arrays_result_format(algo):
+    graph, cfg = make_query()
+    result = run_cfpq(algo, graph, cfg, start_nodes={1, 2}, result_format="arrays")
+    assert isinstance(result, CFPQPairs)
+    assert result.sources.dtype == np.int32 and result.targets.dtype == np.int32
+    nodes = list(result.nodes)
+    assert {
+        (nodes[i], nodes[j]) for i, j in zip(result.sources, result.targets)
+    } == run_cfpq(algo, graph, cfg, start_nodes={1, 2})
+
+
+def test_unknown_result_format():
+    graph, cfg = make_query()
+    with pytest.raises(ValueError):
+        run_cfpq("matrix", graph, cfg, result_format="list")
+
+
+@pytest.mark.parametrize("algo", ALGOS)
+def test_unknown_result_format_in_algorithms(algo):
+    graph, cfg = make_query()
+    with pytest.raises(ValueError):
+        algo_map[algo](cfg, graph, result_format="list")
@@ -44,3 +44,35 @@ def test_cfpq_tensor_3():
         )
         == reachable_pairs
     )
+
+
+def test_cfpq_tensor_matches_hellings():
+    cfg_as_text = """
+            S -> A B | epsilon
+            A -> a | a A
+            B -> b B | b | S
+            """
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 4, label="b")
+    cfg = CFG.from_text(cfg_as_text)
+    assert run_cfpq(algo="tensor", graph=graph, cfg=cfg) == run_cfpq(
+        algo="hellings", graph=graph, cfg=cfg
+    )
+
+
+def test_cfpq_tensor_start_nodes():
+    cfg = CFG.from_text(
+        """
+            S -> A B | epsilon
+            A -> a | a A
+            B -> b B | b | S
+            """
+    )
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 4, label="b")
+    graph.add_edge(7, 8, label="a")
+    full = run_cfpq(algo="tensor", graph=graph, cfg=cfg)
+    for start_nodes in [{0}, {4, 5}, {7}]:
+        assert run_cfpq(
+            algo="tensor", graph=graph, cfg=cfg, start_nodes=start_nodes
+        ) == {(i, j) for i, j in full if i in start_nodes}
@@ -0,0 +1,45 @@
+from pyformlang.cfg import CFG
+
+from project import (
+    CompiledGraph,
+    build_two_cycle_labeled_graph,
+    rpq_bfs,
+    rpq_tensor,
+    run_cfpq,
+)
+
+
+def make_graph():
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 2, label="a")
+    graph.add_edge(5, 0, label="c")
+    return graph
+
+
+def test_compiled_graph_tables():
+    graph = make_graph()
+    compiled = CompiledGraph.from_graph(graph)
+    assert compiled.number_of_nodes() == graph.number_of_nodes()
+    assert compiled.number_of_edges() == graph.number_of_edges()
+    assert set(compiled.labels) == {"a", "b", "c"}
+    assert compiled.label_edges_count[compiled.label_to_id["a"]] == 5
+    assert compiled.matrices["a"].nnz == 4
+    assert set(compiled.edges(data="label")) == set(graph.edges(data="label"))
+
+
+def test_rpq_on_compiled_graph():
+    graph = make_graph()
+    compiled = CompiledGraph.from_graph(graph)
+    for query in ["a* b", "(a|b)* c"]:
+        assert rpq_tensor(compiled, query, {0, 1}) == rpq_tensor(graph, query, {0, 1})
+        assert rpq_bfs(query, compiled, all_reachable=True) == rpq_bfs(
+            query, graph, all_reachable=True
+        )
+
+
+def test_cfpq_on_compiled_graph():
+    graph = make_graph()
+    compiled = CompiledGraph.from_graph(graph)
+    cfg = CFG.from_text("S -> a S b | a b | c")
+    for algo in ["hellings", "matrix", "tensor"]:
+        assert run_cfpq(algo, compiled, cfg) == run_cfpq(algo, graph, cfg)
@@ -1,8 +1,18 @@
 import os
+import random
 
+import pytest
 from pyformlang.cfg import CFG
 
-from project import cyk, get_word_from_file
+from project import (
+    CompiledGrammar,
+    cyk,
+    cyk_batch,
+    cyk_same_length,
+    cyk_valiant,
+    get_word_from_file,
+    iter_words_from_file,
+)
 from tests.test_get__cfg_from_file import create_temp_file
 
 
@@ -48,3 +58,109 @@ def test_cyk_3():
     assert all(cyk(s, cfg) for s in acceptable) and all(
         not cyk(s, cfg) for s in not_acceptable
     )
+
+
+def test_cyk_compiled_grammar():
+    cfg = CFG.from_text(
+        """
+    S -> A B
+    A -> a A | a
+    B -> b B | b | S
+    """
+    )
+    grammar = CompiledGrammar(cfg)
+    acceptable = ["ab", "aabbb", "abab", "aabaabb"]
+    not_acceptable = ["", "a", "ba", "abba", "c"]
+    assert all(cyk(s, grammar) for s in acceptable) and all(
+        not cyk(s, grammar) for s in not_acceptable
+    )
+
+
+def test_cyk_many_variables():
+    cfg = CFG.from_text(
+        "S -> A0 B0\n"
+        + "".join(f"A{i} -> a A{i + 1} | a\n" for i in range(40))
+        + "".join(f"B{i} -> b B{i + 1} | b\n" for i in range(40))
+    )
+    grammar = CompiledGrammar(cfg)
+    assert grammar.words_count == 2
+    assert cyk("a" * 40 + "b" * 40, grammar)
+    assert not cyk("a" * 41 + "b", grammar)
+
+
+def test_cyk_batch():
+    cfg = CFG.from_text(
+        """
+    S -> ( S ) S
+    S -> S ( S )
+    S -> epsilon
+    """
+    )
+    words = ["", "()", "((", "()()", "()(", "((()))", "bb", "(())"]
+    expected = [cyk(word, cfg) for word in words]
+    assert cyk_batch(words, cfg).tolist() == expected
+    assert cyk_batch(iter(words), CompiledGrammar(cfg), batch_size=3).tolist() == (
+        expected
+    )
+    assert cyk_batch(words, cfg, batch_size=2, processes=2).tolist() == expected
+
+
+def test_cyk_same_length_in_chunks():
+    grammar = CompiledGrammar(CFG.from_text("S -> a S b S | $"))
+    rnd = random.Random(0)
+    words = ["".join(rnd.choice("ab") for _ in range(12)) for _ in range(150)]
+    expected = [cyk(word, grammar) for word in words]
+    assert any(expected)
+    assert cyk_same_length(words, grammar).tolist() == expected
+    assert cyk_same_length(words, grammar, memory_bytes=2000).tolist() == expected
+
+
+def test_cyk_batch_from_file():
+    cfg = CFG.from_text(
+        """
+    S -> a S
+    S ->
+    """
+    )
+    file = create_temp_file("words.txt", "a\naaa\n\nba\nc\n")
+    assert cyk_batch(iter_words_from_file(file), cfg).tolist() == [
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]
+    os.remove(file)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "S -> ( S ) S | $",
+        "S -> A B | S S\nA -> a | A A\nB -> b",
+        "S -> a S a | b S b | a | b | $",
+        "S -> a S b | a b",
+    ],
+)
+def test_cyk_valiant_same_as_cyk(text):
+    grammar = CompiledGrammar(CFG.from_text(text))
+    terminals = sorted(grammar.terminal_ids)
+    rnd = random.Random(42)
+    words = ["", terminals[0], "(" * 100 + ")" * 100, "ab" * 150, "a" * 150 + "b" * 150]
+    words += [
+        "".join(rnd.choice(terminals) for _ in range(rnd.randint(1, 200)))
+        for _ in range(12)
+    ]
+    for word in words:
+        assert cyk_valiant(word, grammar, leaf_size=64) == cyk(word, grammar)
+        assert cyk(word, grammar, algo="valiant") == cyk(word, grammar)
+
+
+def test_cyk_valiant_long_word():
+    cfg = CFG.from_text("S -> ( S ) S | $")
+    assert cyk("(()" * 350 + ")" * 350, cfg, algo="valiant")
+    assert not cyk("(()" * 350 + ")" * 349 + "(", cfg, algo="valiant")
+    with pytest.raises(ValueError):
+        cyk("()", cfg, algo="unknown")
+    with pytest.raises(ValueError):
+        cyk_valiant("()", cfg, leaf_size=100)
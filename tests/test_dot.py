@@ -0,0 +1,70 @@
+import io
+
+from networkx import MultiDiGraph
+
+from project import (
+    CompiledGraph,
+    build_two_cycle_labeled_graph,
+    read_dot,
+    read_edge_list_graph,
+    write_dot,
+    write_graph_edge_list,
+)
+
+
+def test_dot_round_trip():
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 2, label="a")
+    graph.add_node("node with spaces", label='say "hi"')
+    graph.add_edge("node with spaces", 0, label="graph")
+    output = io.StringIO()
+    write_dot(graph, output)
+    actual = read_dot(io.StringIO(output.getvalue()))
+    assert list(actual.nodes(data=True)) == list(graph.nodes(data=True))
+    assert list(actual.edges(keys=True, data=True)) == list(
+        graph.edges(keys=True, data=True)
+    )
+
+
+def test_dot_of_compiled_graph():
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    output = io.StringIO()
+    write_dot(CompiledGraph.from_graph(graph), output)
+    actual = read_dot(io.StringIO(output.getvalue()))
+    assert list(actual.nodes) == list(graph.nodes)
+    assert set(actual.edges(data="label")) == set(graph.edges(data="label"))
+
+
+def test_edge_list_round_trip(tmp_path):
+    graph = MultiDiGraph()
+    graph.add_edges_from([(3, 1, {"label": "a"}), (1, 3, {"label": 7})])
+    graph.add_edge(3, 1, label="a")
+    for source in [graph, CompiledGraph.from_graph(graph)]:
+        path = str(tmp_path / "graph.bin")
+        write_graph_edge_list(source, path)
+        actual = read_edge_list_graph(path)
+        assert set(actual.edges(data="label")) == set(graph.edges(data="label"))
+
+
+def test_dot_of_compiled_graph_keeps_parallel_edges():
+    graph = MultiDiGraph()
+    graph.add_edges_from([(0, 1, {"label": "a"}), (0, 1, {"label": "b"})])
+    graph.add_edge(1, 0, label="b")
+    compiled = CompiledGraph.from_graph(graph)
+    output = io.StringIO()
+    write_dot(compiled, output)
+    actual = read_dot(io.StringIO(output.getvalue()))
+    assert sorted(actual.edges(data="label")) == sorted(graph.edges(data="label"))
+    assert sorted(actual.edges(0, keys=True)) == [(0, 1, 0), (0, 1, 1)]
+    assert list(actual.edges(1, keys=True)) == [(1, 0, compiled.label_to_id["b"])]
+
+
+def test_dot_round_trip_backslash_labels():
+    graph = MultiDiGraph()
+    graph.add_edge(0, 1, label="a\\")
+    graph.add_edge(1, "c:\\dir", label='\\"q\\\\')
+    for source in [graph, CompiledGraph.from_graph(graph)]:
+        output = io.StringIO()
+        write_dot(source, output)
+        actual = read_dot(io.StringIO(output.getvalue()))
+        assert list(actual.edges(data="label")) == list(graph.edges(data="label"))
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from project import (
+    AdjacencyMatrix,
+    Frontier,
+    build_two_cycle_labeled_graph,
+    regex_to_min_dfa,
+    sync_bfs,
+)
+
+
+def random_matrix(seed, density):
+    return sparse.random(
+        10, 130, density=density, random_state=seed, format="csr"
+    ).astype(bool)
+
+
+@pytest.mark.parametrize("first_density", [0.01, 0.5])
+@pytest.mark.parametrize("second_density", [0.01, 0.5])
+def test_set_operations(first_density, second_density):
+    first, second = random_matrix(1, first_density), random_matrix(2, second_density)
+    first_front = Frontier.from_sparse(first, threshold=0.1)
+    second_front = Frontier.from_sparse(second, threshold=0.1)
+    assert first_front.is_dense() == (first_density > 0.1)
+    assert first_front.nnz == first.nnz
+
+    difference = first_front.difference(second_front).to_sparse()
+    assert (difference.toarray() == (first > second).toarray()).all()
+    union = first_front.union(second_front).to_sparse()
+    assert (union.toarray() == (first + second).toarray()).all()
+    assert (
+        first_front.select_rows(np.array([7, 2])).to_sparse().toarray()
+        == first[[7, 2]].toarray()
+    ).all()
+
+
+def test_dense_sync_bfs():
+    graph = build_two_cycle_labeled_graph(6, 4, ("A", "B"))
+    graph_matrix = AdjacencyMatrix.from_graph(graph)
+    query_matrix = AdjacencyMatrix(regex_to_min_dfa("A* B* A"))
+    assert sync_bfs(graph_matrix, query_matrix, True, frontier_density=0) == sync_bfs(
+        graph_matrix, query_matrix, True
+    )
+
+
+def test_dense_sync_bfs_in_small_chunks(monkeypatch):
+    monkeypatch.setattr("project.adjacency_matrix.DENSE_STEP_BYTES", 1)
+    graph = build_two_cycle_labeled_graph(6, 4, ("A", "B"))
+    graph_matrix = AdjacencyMatrix.from_graph(graph)
+    query_matrix = AdjacencyMatrix(regex_to_min_dfa("A* B* A"))
+    assert sync_bfs(graph_matrix, query_matrix, True, frontier_density=0) == sync_bfs(
+        graph_matrix, query_matrix, True
+    )
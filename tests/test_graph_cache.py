@@ -0,0 +1,60 @@
+import cfpq_data
+
+from project import GraphCache, load_graph, open_edge_list
+
+
+def write_csv(path):
+    path.write_text("0 1 a\n1 2 b\n2 0 a\n1 2 b\n3 3 c\n")
+    return path
+
+
+def fail_download(graph_name):
+    raise AssertionError("cached graph must not be downloaded")
+
+
+def test_add_csv_and_lookup(tmp_path):
+    cache = GraphCache(tmp_path / "cache")
+    assert cache.lookup("g") is None
+    object_dir = cache.add_csv("g", write_csv(tmp_path / "g.csv"))
+    assert cache.lookup("g") == object_dir
+    records, labels = open_edge_list(str(cache.edge_list_path("g")))
+    assert len(records) == 5
+    assert labels == ["a", "b", "c"]
+
+
+def test_same_content_is_stored_once(tmp_path):
+    cache = GraphCache(tmp_path / "cache")
+    first = cache.add_csv("first", write_csv(tmp_path / "first.csv"))
+    second = cache.add_csv("second", write_csv(tmp_path / "second.csv"))
+    assert first == second
+
+
+def test_load_graph_from_cache(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "g.csv")
+    GraphCache(tmp_path / "cache").add_csv("g", csv_path)
+    monkeypatch.setattr(cfpq_data, "download", fail_download)
+    monkeypatch.setenv("FORMAL_LANG_GRAPH_CACHE", str(tmp_path / "cache"))
+    graph = load_graph("g")
+    expected = cfpq_data.graph_from_csv(csv_path)
+    assert list(graph.nodes) == list(expected.nodes)
+    assert list(graph.edges(data="label")) == list(expected.edges(data="label"))
+
+
+def test_load_graph_downloads_on_miss(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "g.csv")
+    monkeypatch.setattr(cfpq_data, "download", lambda graph_name: csv_path)
+    graph = load_graph("g", str(tmp_path / "cache"))
+    assert graph.number_of_edges() == 5
+    monkeypatch.setattr(cfpq_data, "download", fail_download)
+    assert load_graph("g", str(tmp_path / "cache")).number_of_edges() == 5
+
+
+def test_numeric_labels_are_strings_in_every_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr("project.graph_cache.CSV_CHUNK_SIZE", 2)
+    csv_path = tmp_path / "g.csv"
+    csv_path.write_text("0 1 1\n1 2 2\n2 0 a\n1 2 1\n")
+    cache = GraphCache(tmp_path / "cache")
+    cache.add_csv("g", csv_path)
+    records, labels = open_edge_list(str(cache.edge_list_path("g")))
+    assert labels == ["1", "2", "a"]
+    assert records["label"].tolist() == [0, 1, 2, 0]
@@ -18,3 +18,20 @@ def test_two_cycle_graph_info():
 #         number_of_nodes=332,
 #         edge_labels={"A", "D"},
 #     )
+
+
+def test_compiled_graph_info():
+    graph = cfpq_data.labeled_two_cycles_graph(n=3, m=3, labels=("A", "B"))
+    assert get_graph_info(CompiledGraph.from_graph(graph)) == get_graph_info(graph)
+
+
+def test_graph_statistics():
+    graph = cfpq_data.labeled_two_cycles_graph(n=3, m=2, labels=("A", "B"))
+    graph.add_edge(1, 2, label="A")
+    statistics = get_graph_statistics(graph, quantiles=(0.0, 0.5, 1.0))
+    assert statistics.number_of_nodes == 6
+    assert statistics.number_of_edges == 8
+    assert statistics.label_edges_count == {"A": 5, "B": 3}
+    assert statistics.label_density == {"A": 4 / 36, "B": 3 / 36}
+    assert statistics.out_degree_quantiles == {0.0: 1.0, 0.5: 1.0, 1.0: 2.0}
+    assert statistics.in_degree_quantiles == {0.0: 1.0, 0.5: 1.0, 1.0: 2.0}
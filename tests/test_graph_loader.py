@@ -0,0 +1,60 @@
+import cfpq_data
+import numpy as np
+
+from project import (
+    CompiledGraph,
+    GraphCache,
+    build_nfa_by_graph,
+    compiled_graph_from_csv,
+    get_graph_info,
+    load_compiled_graph,
+    rpq_tensor,
+    write_edge_list,
+    compiled_graph_from_edge_list,
+)
+
+
+def write_csv(path):
+    path.write_text("5 1 a\n1 2 b\n2 5 a\n1 2 b\n3 3 c\n7 1 a\n")
+    return path
+
+
+def assert_same_graph(compiled, graph):
+    expected = CompiledGraph.from_graph(graph)
+    assert compiled.node_list == expected.node_list
+    assert compiled.labels == expected.labels
+    assert compiled.number_of_edges() == expected.number_of_edges()
+    for label in expected.labels:
+        assert (compiled.matrices[label] != expected.matrices[label]).nnz == 0
+
+
+def test_compiled_graph_from_csv(tmp_path):
+    csv_path = write_csv(tmp_path / "g.csv")
+    graph = cfpq_data.graph_from_csv(csv_path)
+    for chunk_size in [1, 2, 100]:
+        assert_same_graph(compiled_graph_from_csv(csv_path, chunk_size), graph)
+
+
+def test_compiled_graph_from_csv_numeric_labels(tmp_path):
+    csv_path = tmp_path / "g.csv"
+    csv_path.write_text("0 1 1\n1 2 2\n2 0 a\n1 0 1\n")
+    graph = cfpq_data.graph_from_csv(csv_path)
+    assert_same_graph(compiled_graph_from_csv(csv_path, 2), graph)
+
+
+def test_compiled_graph_from_edge_list(tmp_path):
+    graph = cfpq_data.graph_from_csv(write_csv(tmp_path / "g.csv"))
+    write_edge_list(graph.edges(data="label"), str(tmp_path / "g.bin"))
+    assert_same_graph(compiled_graph_from_edge_list(tmp_path / "g.bin", 4), graph)
+
+
+def test_load_compiled_graph_with_existing_apis(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "g.csv")
+    GraphCache(tmp_path / "cache").add_csv("g", csv_path)
+    monkeypatch.setattr(cfpq_data, "download", None)
+    compiled = load_compiled_graph("g", str(tmp_path / "cache"))
+    graph = cfpq_data.graph_from_csv(csv_path)
+    assert isinstance(compiled.node_ids, np.ndarray)
+    assert get_graph_info(compiled) == get_graph_info(graph)
+    assert build_nfa_by_graph(compiled).is_equivalent_to(build_nfa_by_graph(graph))
+    assert rpq_tensor(compiled, "a b*") == rpq_tensor(graph, "a b*")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from project import (
+    CompiledGraph,
+    build_two_cycle_labeled_graph,
+    open_compiled_graph,
+    rpq_bfs,
+    rpq_tensor,
+    save_compiled_graph,
+)
+
+
+def make_graph():
+    graph = build_two_cycle_labeled_graph(3, 2, ("a", "b"))
+    graph.add_edge(1, 2, label="a")
+    graph.add_edge(5, 0, label="c")
+    return graph
+
+
+def test_save_and_open_compiled_graph(tmp_path):
+    graph = make_graph()
+    save_compiled_graph(graph, str(tmp_path))
+    opened = open_compiled_graph(str(tmp_path))
+    assert isinstance(opened.node_ids, np.memmap)
+    assert opened.node_list == list(graph.nodes)
+    assert opened.number_of_edges() == graph.number_of_edges()
+    assert set(opened.edges(data="label")) == set(graph.edges(data="label"))
+    for matrix in opened.matrices.values():
+        # Read-only arrays are the mapped files themselves, not copies.
+        assert not matrix.indices.flags.writeable
+        assert not matrix.indptr.flags.writeable
+
+
+def test_queries_on_opened_graph(tmp_path):
+    graph = make_graph()
+    save_compiled_graph(CompiledGraph.from_graph(graph), str(tmp_path))
+    opened = open_compiled_graph(str(tmp_path))
+    for query in ["a* b", "(a|b)* c"]:
+        assert rpq_tensor(opened, query, {0, 1}) == rpq_tensor(graph, query, {0, 1})
+        assert rpq_bfs(query, opened, all_reachable=True) == rpq_bfs(
+            query, graph, all_reachable=True
+        )
+
+
+def test_non_array_nodes(tmp_path):
+    graph = make_graph()
+    graph.add_edge("x", 0, label="b")
+    save_compiled_graph(graph, str(tmp_path))
+    opened = open_compiled_graph(str(tmp_path), mmap=False)
+    assert opened.node_list == list(graph.nodes)
+    assert set(opened.edges(data="label")) == set(graph.edges(data="label"))
+
+
+def test_open_missing_format(tmp_path):
+    (tmp_path / "meta.json").write_text('{"format": "other"}')
+    with pytest.raises(ValueError):
+        open_compiled_graph(str(tmp_path))
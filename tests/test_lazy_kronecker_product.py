@@ -0,0 +1,47 @@
+import networkx as nx
+import numpy as np
+
+from project import (
+    AdjacencyMatrix,
+    LazyKroneckerProduct,
+    build_two_cycle_labeled_graph,
+    intersect_adjacency_matrices,
+    regex_to_min_dfa,
+    rpq_tensor,
+)
+
+
+def make_matrices():
+    graph = build_two_cycle_labeled_graph(4, 3, ("A", "B"))
+    graph.add_edge(2, 5, label="B")
+    return (
+        AdjacencyMatrix.from_graph(graph, start_nodes={0, 2}),
+        AdjacencyMatrix(regex_to_min_dfa("A* B (A|B)")),
+    )
+
+
+def test_matvec_matches_kron():
+    graph_matrix, query_matrix = make_matrices()
+    product = LazyKroneckerProduct(graph_matrix, query_matrix)
+    kron = sum(intersect_adjacency_matrices(graph_matrix, query_matrix).matrix.values())
+    vector = np.random.default_rng(0).random(product.shape[0]) < 0.3
+    assert (product.matvec(vector) == ((kron @ vector) > 0)).all()
+    assert (product.rmatvec(vector) == ((kron.T @ vector) > 0)).all()
+
+
+def test_closure_rows_match_closure():
+    graph_matrix, query_matrix = make_matrices()
+    product = LazyKroneckerProduct(graph_matrix, query_matrix)
+    intersected = intersect_adjacency_matrices(graph_matrix, query_matrix)
+    closure = intersected.make_transitive_closure()
+    sources = np.array([0, 3, 7, 11])
+    assert (product.closure_rows(sources).toarray() == closure[sources].toarray()).all()
+    assert (product.get_start_indices() == intersected.get_start_indices()).all()
+    assert (product.get_final_indices() == intersected.get_final_indices()).all()
+
+
+def test_lazy_rpq_tensor():
+    graph = build_two_cycle_labeled_graph(5, 3, ("A", "B"))
+    for query in ["AAAAAA|B", "A*B*", "B A*"]:
+        assert rpq_tensor(graph, query, lazy=True) == rpq_tensor(graph, query)
+    assert rpq_tensor(nx.MultiDiGraph(), "A", lazy=True) == set()
@@ -0,0 +1,45 @@
+import pytest
+
+from project import (
+    QueryCache,
+    build_two_cycle_labeled_graph,
+    normalize_regex,
+    query_cache,
+    regex_to_min_dfa,
+    rpq_tensor,
+)
+
+
+def test_normalize_regex():
+    assert normalize_regex("  a   b*\t| c ") == "a b* | c"
+
+
+def test_hits_and_misses():
+    cache = QueryCache(max_size=2)
+    first = cache.get("A B*")
+    assert cache.get(" A  B* ") is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first.dfa.is_equivalent_to(regex_to_min_dfa("A B*"))
+    assert first.matrix.get_states_count() == len(first.dfa.states)
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_size=2)
+    cache.get("A")
+    cache.get("B")
+    cache.get("A")
+    cache.get("C")
+    assert "A" in cache and "C" in cache and "B" not in cache
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 0 and cache.misses == 0
+    with pytest.raises(ValueError):
+        QueryCache(max_size=0)
+
+
+def test_repeated_query_skips_compilation():
+    graph = build_two_cycle_labeled_graph(3, 2, ("A", "B"))
+    query_cache.clear()
+    expected = rpq_tensor(graph, "A* B")
+    assert rpq_tensor(graph, "A*  B") == expected
+    assert (query_cache.hits, query_cache.misses) == (1, 1)
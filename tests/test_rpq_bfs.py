@@ -1,6 +1,14 @@
 import networkx as nx
+import pytest
 
-from project import build_two_cycle_labeled_graph, rpq_bfs
+from project import (
+    AdjacencyMatrix,
+    build_two_cycle_labeled_graph,
+    iter_parallel_sync_bfs,
+    regex_to_min_dfa,
+    rpq_bfs,
+    sync_bfs,
+)
 
 
 def make_graph_two_cycled():
@@ -69,3 +77,50 @@ def test_rpq_bfs_2():
         all_reachable=True,
     )
     assert actual_rpq == expected_rpq
+
+
+def test_rpq_bfs_all_reachable_matches_single_sources():
+    graph = make_graph_two_cycled()
+    graph.add_edge(3, 7, label="A")
+    query = "A* B (A|B)*"
+    actual_rpq = rpq_bfs(graph=graph, query=query, all_reachable=True)
+    assert actual_rpq == {
+        start: rpq_bfs(graph=graph, query=query, start_nodes={start})
+        for start in graph.nodes
+    }
+
+
+def test_rpq_bfs_batched():
+    graph = make_graph_two_cycled()
+    query = "A* B (A|B)*"
+    batched = rpq_bfs(graph=graph, query=query, all_reachable=True, batch_size=3)
+    assert not isinstance(batched, dict)
+    assert dict(batched) == rpq_bfs(graph=graph, query=query, all_reachable=True)
+    with pytest.raises(ValueError):
+        rpq_bfs(graph=graph, query=query, all_reachable=True, batch_size=0)
+
+
+def test_rpq_bfs_parallel():
+    graph = make_graph_two_cycled()
+    query = "A* B (A|B)*"
+    for all_reachable in (True, False):
+        assert rpq_bfs(
+            graph=graph, query=query, all_reachable=all_reachable, workers=2
+        ) == rpq_bfs(graph=graph, query=query, all_reachable=all_reachable)
+    batched = rpq_bfs(
+        graph=graph, query=query, all_reachable=True, batch_size=2, workers=2
+    )
+    assert dict(batched) == rpq_bfs(graph=graph, query=query, all_reachable=True)
+
+
+def test_iter_parallel_sync_bfs_closed_early():
+    graph_matrix = AdjacencyMatrix.from_graph(make_graph_two_cycled())
+    query_matrix = AdjacencyMatrix(regex_to_min_dfa("A* B (A|B)*"))
+    expected = sync_bfs(graph_matrix, query_matrix, True)
+    results = iter_parallel_sync_bfs(
+        graph_matrix, query_matrix, True, workers=1, batch_size=1
+    )
+    first = next(results)
+    results.close()
+    assert len(first) == 1
+    assert first.items() <= expected.items()
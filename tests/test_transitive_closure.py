@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from project import CLOSURE_STRATEGIES, choose_closure_strategy, transitive_closure
+
+
+def naive_closure(matrix):
+    result = matrix.toarray().astype(bool)
+    while True:
+        updated = result | (result.astype(int) @ result.astype(int) > 0)
+        if (updated == result).all():
+            return result
+        result = updated
+
+
+@pytest.mark.parametrize("strategy", CLOSURE_STRATEGIES.keys())
+@pytest.mark.parametrize("seed", range(5))
+def test_random_matrix(strategy, seed):
+    matrix = sparse.random(40, 40, density=0.04, random_state=seed, format="csr")
+    actual = transitive_closure(matrix.astype(bool), strategy)
+    assert (actual.toarray() == naive_closure(matrix)).all()
+
+
+@pytest.mark.parametrize("strategy", CLOSURE_STRATEGIES.keys())
+def test_chain_with_cycle(strategy):
+    rows, cols = [0, 1, 2, 3, 4], [1, 2, 3, 1, 5]
+    matrix = sparse.csr_matrix(
+        (np.ones(5, dtype=bool), (rows, cols)), shape=(7, 7), dtype=bool
+    )
+    actual = transitive_closure(matrix, strategy)
+    assert (actual.toarray() == naive_closure(matrix)).all()
+    assert actual[1, 1] and not actual[0, 0] and not actual[6].nnz
+
+
+def test_choose_strategy():
+    assert choose_closure_strategy(sparse.eye(10, format="csr")) == "squaring"
+    chain = sparse.eye(10000, k=1, format="csr", dtype=bool)
+    assert choose_closure_strategy(chain) == "condensation"
+    with pytest.raises(ValueError):
+        transitive_closure(chain, "unknown")
+
+
+def test_auto_on_chain_uses_condensation():
+    chain = sparse.eye(1000, k=1, format="csr", dtype=bool)
+    assert choose_closure_strategy(chain) == "condensation"
+    auto = transitive_closure(chain)
+    squared = transitive_closure(chain, "squaring")
+    assert auto.nnz == 1000 * 999 // 2
+    assert (auto != squared).nnz == 0